@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Benchmark the capture-to-HTTP pipeline and print the results as JSON.
+
+Stage benchmarks run in-process on a synthetic frame.
+HTTP benchmarks start main.py with a hardware-free backend (simulation or a replayed recording)
+and hit its routes with concurrent clients while sampling CPU and memory of the server processes.
+Compare the output of two commits to see the effect of a change.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import httpx
+import numpy as np
+import psutil
+
+from zedxmini.encoding import convert
+from zedxmini.information import CameraInformation
+from zedxmini.point_cloud_processing import PointCloudProcessor
+from zedxmini.points import box_statistics, gather_points
+from zedxmini.stereo_depth import StereoDepthEngine
+from zedxmini.synthetic_scene import SyntheticScene
+
+ROOT = Path(__file__).parent
+
+
+def summarize(latencies: list[float], duration: float) -> dict:
+    values = np.asarray(latencies) * 1000.0
+    return {
+        'count': len(latencies),
+        'throughput': len(latencies) / duration if duration > 0 else 0.0,
+        'p50_ms': float(np.percentile(values, 50)) if len(values) else None,
+        'p99_ms': float(np.percentile(values, 99)) if len(values) else None,
+    }
+
+
+def measure(function: Callable[[], object], duration: float) -> dict:
+    latencies: list[float] = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        t = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def benchmark_stages(args: argparse.Namespace) -> dict:
+    # NOTE: scaled like the simulation does, so that the stereo matcher gets intrinsics matching the resolution
+    information = CameraInformation.load(ROOT / 'camera_information.json').scaled(args.width, args.height).to_dict()
+    scene = SyntheticScene(information['calibration'], information['resolution'], args.width, args.height)
+    buffer = np.empty_like(scene.left)
+    rng = np.random.default_rng(0)
+    pixels = np.stack([rng.integers(0, args.width, 1000), rng.integers(0, args.height, 1000)], axis=1)
+    results = {'frame_copy': measure(lambda: np.copyto(buffer, scene.left), args.duration)}
+    for shrink in args.shrink:
+        results[f'convert_shrink_{shrink}'] = measure(lambda: convert(scene.left, shrink=shrink), args.duration)
+    results['gather_points_1000'] = measure(lambda: gather_points(scene.xyz, pixels), args.duration)
+    results['box_statistics_200x200'] = measure(lambda: box_statistics(scene.xyz, (800, 500, 1000, 700)), args.duration)
+    processor = PointCloudProcessor()
+    results['analyze_point_cloud'] = measure(lambda: processor.process(scene.xyz, 0.0), args.duration)
+    for downscale in args.stereo_downscale:
+        engine = StereoDepthEngine(information['calibration'], (args.width, args.height), downscale=downscale)
+        results[f'stereo_depth_downscale_{downscale}'] = \
+            measure(lambda: engine.compute(scene.left, scene.right), args.duration)
+        engine.close()
+    return results
+
+
+class ResourceSampler:
+    """Samples CPU and RSS of a process and all of its children in a background thread."""
+
+    def __init__(self, pid: int, interval: float = 0.2) -> None:
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.cpu: list[float] = []
+        self.peak_rss = 0
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+    def _processes(self) -> list[psutil.Process]:
+        return [self.process, *self.process.children(recursive=True)]
+
+    def _sample(self) -> None:
+        known: dict[int, psutil.Process] = {}
+        while self._running:
+            cpu = 0.0
+            rss = 0
+            for process in self._processes():
+                try:
+                    process = known.setdefault(process.pid, process)
+                    cpu += process.cpu_percent()
+                    rss += process.memory_info().rss
+                except psutil.NoSuchProcess:
+                    continue
+            self.cpu.append(cpu)
+            self.peak_rss = max(self.peak_rss, rss)
+            time.sleep(self.interval)
+
+    def __enter__(self) -> 'ResourceSampler':
+        self._running = True
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_) -> None:
+        self._running = False
+        assert self._thread is not None
+        self._thread.join()
+
+    @property
+    def result(self) -> dict:
+        samples = self.cpu[1:]  # the first cpu_percent() of a process is always 0
+        return {
+            'cpu_percent': float(np.mean(samples)) if samples else None,
+            'peak_rss_mb': self.peak_rss / 1024 / 1024,
+        }
+
+
+async def run_clients(base_url: str, method: str, path: str, body: dict | None, clients: int, duration: float) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    received = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=10.0) as client:
+        end = time.perf_counter() + duration
+
+        async def work() -> None:
+            nonlocal errors, received
+            while time.perf_counter() < end:
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    response.raise_for_status()
+                    received += len(response.content)
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+        start = time.perf_counter()
+        await asyncio.gather(*(work() for _ in range(clients)))
+    result = summarize(latencies, time.perf_counter() - start)
+    result.update(errors=errors, megabytes=received / 1024 / 1024)
+    return result
+
+
+def scrape_metric(base_url: str, name: str) -> float | None:
+    text = httpx.get(f'{base_url}/metrics', timeout=5.0).text
+    for line in text.splitlines():
+        if line.startswith(f'zedxmini_{name}{{'):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def benchmark_http(args: argparse.Namespace) -> dict:
+    base_url = f'http://localhost:{args.port}'
+    env = {**os.environ, 'ZEDXMINI_SIMULATION': '1', 'ZEDXMINI_PORT': str(args.port)}
+    if args.replay:
+        env.update(ZEDXMINI_REPLAY=str(args.replay.resolve()), ZEDXMINI_REPLAY_SPEED=str(args.replay_speed))
+    server = subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                if httpx.get(f'{base_url}/image/jpeg', timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.time() > deadline or server.poll() is not None:
+                raise RuntimeError('server did not come up')
+            time.sleep(0.5)
+
+        scenarios: list[tuple[str, str, str, dict | None]] = [
+            *((f'images_left_shrink_{shrink}', 'GET', f'/images/left?shrink={shrink}', None) for shrink in args.shrink),
+            ('image_json', 'GET', '/image', None),
+            ('image_jpeg', 'GET', '/image/jpeg', None),
+            ('point', 'GET', f'/point?x={args.width // 2}&y={args.height // 2}', None),
+            ('points_100', 'POST', '/points',
+             {'pixels': [[x, args.height // 2] for x in range(0, args.width, args.width // 100)][:100]}),
+            ('depth_raw_png', 'GET', '/depth/raw', None),
+            ('pointcloud_npy_stride_4', 'GET', '/pointcloud?stride=4', None),
+            ('obstacles', 'GET', '/obstacles', None),
+        ]
+        results = {}
+        for name, method, path, body in scenarios:
+            frames_before = scrape_metric(base_url, 'captured_frames_total') or 0.0
+            with ResourceSampler(server.pid) as sampler:
+                result = asyncio.run(run_clients(base_url, method, path, body, args.clients, args.duration))
+            result.update(sampler.result)
+            frames = (scrape_metric(base_url, 'captured_frames_total') or 0.0) - frames_before
+            result['capture_fps'] = frames / args.duration
+            results[name] = result
+        return results
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the Zedxmini capture-to-HTTP pipeline.')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--clients', type=int, default=4, help='concurrent HTTP clients')
+    parser.add_argument('--shrink', type=int, nargs='+', default=[1, 2, 4], help='shrink factors to benchmark')
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--stereo-downscale', type=int, nargs='*', default=[1, 2],
+                        help='downscale factors to benchmark CPU stereo depth with')
+    parser.add_argument('--port', type=int, default=8013)
+    parser.add_argument('--replay', type=Path, help='serve this recording instead of the synthetic scene')
+    parser.add_argument('--replay-speed', type=float, default=1.0, help='replay speed factor ("inf" for full speed)')
+    parser.add_argument('--skip-http', action='store_true', help='only run the in-process stage benchmarks')
+    parser.add_argument('--output', type=Path, help='write JSON to this file instead of stdout')
+    args = parser.parse_args()
+
+    commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    report = {
+        'commit': commit,
+        'time': time.time(),
+        'config': {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        'machine': {'cpus': psutil.cpu_count(), 'platform': sys.platform},
+        'stages': benchmark_stages(args),
+    }
+    if not args.skip_http:
+        report['http'] = benchmark_http(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
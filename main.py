@@ -1,13 +1,22 @@
-import base64
 import logging
+import os
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING
 
 import rosys
-from fastapi import Response
-from fastapi.responses import JSONResponse
+from fastapi import Request, Response
+from fastapi.responses import PlainTextResponse
 from nicegui import app, ui
-from rosys.vision.image_route import _process
 
 from zedxmini import StereoCard, Zedxmini, ZedxminiSimulation
+from zedxmini.governor import QualityGovernor
+from zedxmini.metrics import render_metrics
+from zedxmini.routes import create_router
+from zedxmini.zedxmini import ZedxminiBase
+
+if TYPE_CHECKING:
+    from zedxmini import ZedxminiManager
 
 logging.config.dictConfig({
     'version': 1,
@@ -40,69 +49,72 @@ logging.config.dictConfig({
     },
 })
 
-black_1px = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAAAXNSR0IArs4c6QAAAA1JREFUGFdjYGBg+A8AAQQBAHAgZQsAAAAASUVORK5CYII='
-placeholder = Response(content=base64.b64decode(black_1px.encode('ascii')), media_type='image/png')
-
 
-@app.get('/images/{image_name}')
-async def grab_frame(image_name: str, shrink: int = 1) -> Response:
-    if camera is None:
-        return placeholder
-    if camera.last_frame is None:
-        return placeholder
-    data: bytes | None = None
-    if image_name == 'left':
-        data = camera.last_frame.left.data
-    elif image_name == 'right':
-        data = camera.last_frame.right.data
-    elif image_name == 'depth':
-        data = camera.last_frame.depth.data
-    if data is None:
-        return placeholder
-    data = _process(data, None, shrink, False)
-    return Response(content=data, media_type='image/jpeg')
+@app.middleware('http')
+async def measure_request(request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    path = getattr(route, 'path', '')
+    if path and not path.startswith('/_nicegui') and path != '/metrics':
+        key, _, camera_path = path.removeprefix('/cameras/').partition('/')
+        if path.startswith('/cameras/') and key in cameras:
+            cameras[key].metrics.observe(f'http /{camera_path}', time.perf_counter() - start)
+        else:
+            camera.metrics.observe(f'http {path}', time.perf_counter() - start)
+    return response
 
 
-@app.get('/image')
-async def grab_image() -> JSONResponse:
-    if not camera.has_frames:
-        return JSONResponse('')
-    assert camera.last_frame is not None
-    image = camera.last_frame.left
-    assert image is not None
-    assert image.data is not None
-    encoded_image = image.data.hex()
-    return JSONResponse({
-        'camera_id': image.camera_id,
-        'width': image.size.width,
-        'height': image.size.height,
-        'time': image.time,
-        'is_broken': image.is_broken,
-        'tags': list(image.tags),
-        'image': encoded_image,
-    })
+@app.get('/metrics')
+async def get_metrics() -> PlainTextResponse:
+    metrics = [camera.metrics for camera in cameras.values()]
+    if manager is not None:
+        metrics.append(manager.metrics)
+    return PlainTextResponse(render_metrics(metrics), media_type='text/plain; version=0.0.4')
 
 
-@app.get('/point')
-async def get_point(x: int = 0, y: int = 0) -> JSONResponse:
-    point3d: rosys.geometry.Point3d | None = camera.get_point(int(x), int(y))
-    return JSONResponse({
-        'x': point3d.x,
-        'y': point3d.y,
-        'z': point3d.z,
-    })
+simulation: bool = os.environ.get('ZEDXMINI_SIMULATION', '') == '1'
+replay: str = os.environ.get('ZEDXMINI_REPLAY', '')
+serials: str = os.environ.get('ZEDXMINI_SERIALS', '')
+# downscale factor for matching depth on the CPU in simulation and replay; empty to use the scene or recording
+stereo_downscale: str = os.environ.get('ZEDXMINI_STEREO_DEPTH', '')
+stereo_options = {'stereo_depth': True, 'stereo_downscale': int(stereo_downscale)} if stereo_downscale else {}
+# NOTE: optional backends and the recorder are only imported when configured
+manager: 'ZedxminiManager | None' = None
+cameras: dict[str, ZedxminiBase]
+if replay:
+    from zedxmini import ZedxminiReplay
+    cameras = {'replay': ZedxminiReplay(replay, speed=float(os.environ.get('ZEDXMINI_REPLAY_SPEED', 1.0)),
+                                        **stereo_options)}
+elif serials:
+    from zedxmini import ZedxminiManager
+    manager = ZedxminiManager([int(serial) for serial in serials.split(',')], simulation=simulation)
+    cameras = manager.cameras
+elif simulation:
+    cameras = {'simulation': ZedxminiSimulation(**stereo_options)}
+else:
+    cameras = {'default': Zedxmini()}
+# the governors only step automatically when enabled; their level can always be set through the API and UI
+governors = {key: QualityGovernor(routed_camera, enabled=os.environ.get('ZEDXMINI_GOVERNOR', '') == '1',
+                                  target_latency=float(os.environ.get('ZEDXMINI_GOVERNOR_TARGET', 0.1)))
+             for key, routed_camera in cameras.items()}
+# the first camera is also served without prefix
+camera = next(iter(cameras.values()))
+for key, routed_camera in cameras.items():
+    app.include_router(create_router(routed_camera, governors[key]), prefix=f'/cameras/{key}')
+app.include_router(create_router(camera, governors[next(iter(cameras))]))
+if os.environ.get('ZEDXMINI_RECORD'):
+    from zedxmini import Recorder
+    recorder = Recorder(camera, os.environ['ZEDXMINI_RECORD'], jpeg=os.environ.get('ZEDXMINI_RECORD_JPEG', '') == '1')
+    # NOTE: the recording starts with the camera information, which is only certain once the camera is open
+    camera.READY.register(recorder.start)
+    rosys.on_shutdown(recorder.stop)
 
 
-@app.get('/information')
-async def get_information() -> JSONResponse:
-    return JSONResponse(camera.get_camera_information())
+@ui.page('/')
+def index() -> None:
+    for key, stereo_camera in cameras.items():
+        StereoCard(stereo_camera, governor=governors[key])
 
-simulation: bool = False
-camera: Zedxmini | ZedxminiSimulation
-if simulation:
-    camera = ZedxminiSimulation()
-else:
-    camera = Zedxmini()
-stereo_card = StereoCard(camera)
 
-ui.run(title='Zedxmini', reload=True, port=8003)
+ui.run(title='Zedxmini', reload=True, port=int(os.environ.get('ZEDXMINI_PORT', 8003)))
@@ -0,0 +1,43 @@
+import numpy as np
+
+from zedxmini.frame_history import FrameHistory
+from zedxmini.zedxmini import Frame
+
+
+def make_frame(history: FrameHistory, timestamp: float) -> Frame:
+    left = history.claim('left', (2, 2, 4))
+    left[:] = timestamp
+    return Frame(camera_id='test', timestamp=timestamp, left=left, right=None, depth=None, point_cloud=None)
+
+
+def test_frame_is_evicted_before_its_slot_is_written():
+    history = FrameHistory(3)
+    frames = []
+    for timestamp in range(3):
+        frames.append(make_frame(history, timestamp))
+        history.append(frames[-1])
+    assert all(frame in history for frame in frames)
+
+    history.claim('left', (2, 2, 4))
+    assert frames[0] not in history
+    assert history.find(0, exact=True) is None
+    assert frames[1] in history and frames[2] in history
+
+
+def test_generation_detects_reuse_of_a_held_frame():
+    history = FrameHistory(2)
+    held = make_frame(history, 1.0)
+    history.append(held)
+    history.append(make_frame(history, 2.0))
+    assert held in history
+    copy = held.left.copy()
+
+    history.append(make_frame(history, 3.0))
+    assert held not in history
+    assert not np.array_equal(held.left, copy)
+
+
+def test_frame_not_appended_is_not_in_history():
+    history = FrameHistory(2)
+    frame = Frame(camera_id='test', timestamp=0.0, left=None, right=None, depth=None, point_cloud=None)
+    assert frame not in history
@@ -0,0 +1,28 @@
+import numpy as np
+
+from zedxmini.point_cloud_processing import PointCloudProcessor
+from zedxmini.synthetic_scene import BOXES, CAMERA_HEIGHT, WALL_DISTANCE, SyntheticScene
+from zedxmini.zedxmini import SIMULATED_CAMERA_INFORMATION
+
+
+def test_ground_plane_and_obstacles_of_synthetic_scene():
+    scene = SyntheticScene(SIMULATED_CAMERA_INFORMATION['calibration'], SIMULATED_CAMERA_INFORMATION['resolution'],
+                           480, 270)
+    analysis = PointCloudProcessor(stride=1).process(scene.xyz, 1.0)
+
+    assert analysis.ground is not None
+    np.testing.assert_allclose(analysis.ground.normal, (0, -1, 0), atol=0.01)
+    assert abs(analysis.ground.offset - CAMERA_HEIGHT / 1000) < 0.01
+
+    grid = analysis.grid
+    assert grid is not None
+    occupied = grid.occupied(min_height=0.2)
+    box_rows = set()
+    for x0, x1, _, _, z, _ in BOXES:
+        row = int(z / 1000 / grid.resolution)
+        column = int(((x0 + x1) / 2 / 1000 - grid.x_min) / grid.resolution)
+        assert occupied[row, column], f'box at z={z} mm should occupy its cell'
+        box_rows.add(row)
+    wall_row = int(WALL_DISTANCE / 1000 / grid.resolution)
+    free_rows = [row for row in range(wall_row) if row not in box_rows]
+    assert not occupied[free_rows].any(), 'the ground in front of the wall should be free apart from the boxes'
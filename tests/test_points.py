@@ -0,0 +1,65 @@
+import numpy as np
+
+from zedxmini.points import box_statistics, clip_box, gather_points, voxel_downsample
+
+
+def make_xyz(width: int = 8, height: int = 6) -> np.ndarray:
+    """XYZ measure in millimeters whose point at (x, y) is (x, y, 1000 + x)."""
+    y, x = np.mgrid[:height, :width].astype(np.float32)
+    return np.stack([x, y, 1000 + x, np.zeros_like(x)], axis=2)
+
+
+def test_gather_points_converts_to_meters():
+    points = gather_points(make_xyz(), [(2, 3), (7, 5)])
+    np.testing.assert_allclose(points, [[0.002, 0.003, 1.002], [0.007, 0.005, 1.007]], rtol=1e-6)
+
+
+def test_gather_points_outside_the_image_or_without_depth_are_nan():
+    xyz = make_xyz()
+    xyz[1, 1, 2] = np.nan
+    points = gather_points(xyz, [(-1, 0), (8, 0), (0, 6), (1, 1), (0, 0)])
+    assert np.isnan(points[:4]).all()
+    assert np.isfinite(points[4]).all()
+
+
+def test_clip_box_orders_and_clips_corners():
+    assert clip_box((5, 4, 1, 2), 8, 6) == (1, 2, 5, 4)
+    assert clip_box((-3, 10, 20, -1), 8, 6) == (0, 0, 8, 6)
+    assert clip_box((10, 1, 12, 3), 8, 6) == (8, 1, 8, 3)
+
+
+def test_box_statistics_of_valid_points():
+    xyz = make_xyz()
+    xyz[2, 2, :3] = np.nan
+    statistics = box_statistics(xyz, (4, 3, 1, 1))  # NOTE: reversed corners
+    assert statistics.box == (1, 1, 4, 3)
+    assert statistics.valid_ratio == 5 / 6
+    assert statistics.centroid is not None
+    np.testing.assert_allclose(statistics.centroid.tuple, (0.002, 0.001, 1.002), rtol=1e-6)
+    assert statistics.median_depth == statistics.centroid.z
+
+
+def test_box_statistics_of_empty_or_invalid_boxes():
+    xyz = make_xyz()
+    empty = box_statistics(xyz, (20, 20, 30, 30))
+    assert empty.valid_ratio == 0.0 and empty.centroid is None and empty.median_depth is None
+
+    xyz[:, :, 2] = np.nan
+    invalid = box_statistics(xyz, (0, 0, 2, 2))
+    assert invalid.box == (0, 0, 2, 2)
+    assert invalid.valid_ratio == 0.0 and invalid.centroid is None and invalid.median_depth is None
+
+
+def test_voxel_downsample_averages_points_per_voxel():
+    points = np.array([[0.01, 0.01, 1.0], [0.03, 0.02, 1.0], [0.5, 0.0, 1.0], [np.nan, 0.0, 1.0]], dtype=np.float32)
+    centroids = voxel_downsample(points, 0.1)
+    np.testing.assert_allclose(sorted(centroids.tolist()), [[0.02, 0.015, 1.0], [0.5, 0.0, 1.0]], rtol=1e-6)
+
+
+def test_voxel_downsample_keeps_distant_voxels_apart_when_keys_would_overflow():
+    # NOTE: 2**22 voxels per axis; packed, the key of (2**20, 0, 0) would wrap around 2**64 onto the one of (0, 0, 0)
+    voxel_size = 2.0**-20
+    far = (2**22 - 1) * voxel_size
+    points = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [far, far, far]], dtype=np.float32)
+    centroids = voxel_downsample(points, voxel_size)
+    np.testing.assert_allclose(sorted(centroids.tolist()), sorted(points.tolist()))
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+import pytest
+
+from zedxmini.information import CameraInformation
+from zedxmini.recording import ALIGNMENT, INFORMATION_FILE, Recorder, chunk_path, read_index
+from zedxmini.replay import ZedxminiReplay
+from zedxmini.zedxmini import SIMULATED_CAMERA_INFORMATION, Frame, ZedxminiBase
+
+SHAPE = (48, 64, 4)
+
+
+class RecordedCamera(ZedxminiBase):
+    """Camera whose frames are stored by the test."""
+
+    def __init__(self, history_size: int = 5) -> None:
+        super().__init__('RecordedCamera', history_size)
+        self.camera_information = CameraInformation.from_dict(SIMULATED_CAMERA_INFORMATION)
+
+    def setup_camera(self):
+        pass
+
+    def get_camera_setting(self, setting_type) -> tuple[bool, int]:
+        return (False, -1)
+
+    def set_camera_setting(self, setting_type, value) -> bool:
+        return False
+
+
+def make_frame(camera: ZedxminiBase, index: int) -> Frame:
+    left = camera.frame_history.claim('left', SHAPE)
+    left[:] = 10 * index
+    left[:, :SHAPE[1] // 2] += 100  # NOTE: an edge, so that the JPEG encoding has some structure to preserve
+    xyz = camera.frame_history.claim('xyz', SHAPE, np.float32)
+    xyz[:] = np.arange(xyz.size, dtype=np.float32).reshape(SHAPE) + index
+    return Frame(camera_id=camera.name, timestamp=1000.0 + index / 30, left=left, right=None, depth=None,
+                 point_cloud=xyz)
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def record(camera: RecordedCamera, recorder: Recorder, count: int) -> list[Frame]:
+    """Store frames one by one, waiting for each to be written so that none is dropped."""
+    recorded = []
+    for index in range(count):
+        frame = make_frame(camera, index)
+        camera.store_frame(frame)
+        recorded.append(Frame(camera_id=frame.camera_id, timestamp=frame.timestamp, left=frame.left.copy(),
+                              right=None, depth=None, point_cloud=frame.point_cloud.copy()))
+        wait_for(lambda: recorder.statistics.frames + recorder.statistics.dropped > index)
+    return recorded
+
+
+@pytest.mark.parametrize('jpeg', [False, True])
+def test_record_and_replay(tmp_path, jpeg: bool):
+    camera = RecordedCamera()
+    frame_nbytes = 2 * np.prod(SHAPE) * 4
+    recorder = Recorder(camera, tmp_path, channels=('left', 'xyz'), jpeg=jpeg, chunk_size=2 * frame_nbytes)
+    recorder.start()
+    recorded = record(camera, recorder, 6)
+    recorder.stop()
+    assert recorder.statistics.frames == 6 and recorder.statistics.dropped == 0
+
+    index = read_index(tmp_path)
+    assert [entry['timestamp'] for entry in index] == [frame.timestamp for frame in recorded]
+    assert index[-1]['channels']['xyz']['chunk'] > 0, 'the recording should span several chunks'
+    for entry in index:
+        assert entry['channels']['left']['encoding'] == ('jpeg' if jpeg else 'raw')
+        assert entry['channels']['xyz']['encoding'] == 'raw'
+        for location in entry['channels'].values():
+            assert location['offset'] % ALIGNMENT == 0
+            assert location['offset'] + location['nbytes'] <= chunk_path(tmp_path, location['chunk']).stat().st_size
+    information = json.loads((tmp_path / INFORMATION_FILE).read_text())
+    assert CameraInformation.from_dict(information) == camera.camera_information
+
+    replay = ZedxminiReplay(tmp_path, speed=float('inf'), loop=False)
+    assert replay.camera_information == camera.camera_information
+    replay.subscriptions.subscribe('left')
+    replay.subscriptions.subscribe('xyz')
+    replayed: list[Frame] = []
+    replay.frame_sinks.append(lambda frame: replayed.append(
+        Frame(camera_id=frame.camera_id, timestamp=frame.timestamp, left=frame.left.copy(), right=None, depth=None,
+              point_cloud=frame.point_cloud.copy())))
+    assert replay._open()
+    asyncio.run(replay._play())
+
+    assert [frame.timestamp for frame in replayed] == [frame.timestamp for frame in recorded]
+    for original, frame in zip(recorded, replayed):
+        np.testing.assert_array_equal(frame.point_cloud, original.point_cloud)
+        if jpeg:
+            assert frame.left.shape == SHAPE
+            assert np.abs(frame.left[..., :3].astype(int) - original.left[..., :3]).max() <= 8
+        else:
+            np.testing.assert_array_equal(frame.left, original.left)
+
+
+def test_frame_reused_while_writing_is_rewound(tmp_path):
+    camera = RecordedCamera(history_size=3)
+    recorder = Recorder(camera, tmp_path, channels=('left', 'xyz'))
+    recorder.start()
+    record(camera, recorder, 1)
+    size = chunk_path(tmp_path, 0).stat().st_size
+    written = recorder.statistics.bytes
+
+    frame = make_frame(camera, 1)
+    camera.frame_history.append(frame)  # NOTE: bypasses the recorder's queue, the frame is written below
+    write = recorder._write
+
+    def write_and_reuse(data):
+        location = write(data)
+        while frame in camera.frame_history:  # the capture thread moves on until it claims the frame's slot
+            camera.frame_history.append(make_frame(camera, 2))
+        return location
+    recorder._write = write_and_reuse  # type: ignore[method-assign]
+    recorder._write_frame(frame)
+    recorder._write = write  # type: ignore[method-assign]
+    recorder.stop()
+
+    assert recorder.statistics.frames == 1 and recorder.statistics.dropped == 1
+    assert recorder.statistics.bytes == written
+    assert chunk_path(tmp_path, 0).stat().st_size == size
+    assert len(read_index(tmp_path)) == 1
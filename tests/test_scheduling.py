@@ -0,0 +1,63 @@
+import asyncio
+
+from zedxmini.scheduling import FairScheduler
+
+
+def test_competing_owners_are_served_in_turn():
+    async def run() -> list[str]:
+        scheduler = FairScheduler(1)
+        granted: list[str] = []
+
+        async def request(owner: str) -> None:
+            async with scheduler.use(owner):
+                granted.append(owner)
+                await asyncio.sleep(0)
+
+        token = await scheduler.acquire()
+        tasks = [asyncio.create_task(request('a')) for _ in range(3)]
+        tasks += [asyncio.create_task(request('b')) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 6
+        scheduler.release(token)
+        await asyncio.gather(*tasks)
+        assert scheduler.busy == 0 and scheduler.waiting == 0
+        return granted
+
+    assert asyncio.run(run()) == ['a', 'b', 'a', 'b', 'a', 'b']
+
+
+def test_cancelled_waiter_is_removed():
+    async def run() -> None:
+        scheduler = FairScheduler(1)
+        token = await scheduler.acquire('a')
+        waiter = asyncio.create_task(scheduler.acquire('b'))
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 1
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert waiter.cancelled()
+        assert scheduler.waiting == 0
+
+        scheduler.release(token)
+        assert scheduler.busy == 0
+
+    asyncio.run(run())
+
+
+def test_token_granted_to_a_cancelled_waiter_is_passed_on():
+    async def run() -> None:
+        scheduler = FairScheduler(1)
+        token = await scheduler.acquire('a')
+        cancelled = asyncio.create_task(scheduler.acquire('b'))
+        next_waiter = asyncio.create_task(scheduler.acquire('c'))
+        await asyncio.sleep(0)
+
+        scheduler.release(token)  # NOTE: grants the token to 'b' which is cancelled before it resumes
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        assert cancelled.cancelled()
+        assert await asyncio.wait_for(next_waiter, timeout=1.0) == token
+        assert scheduler.busy == 1 and scheduler.waiting == 0
+
+    asyncio.run(run())
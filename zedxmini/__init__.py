@@ -1,8 +1,41 @@
-from .stereo_card import StereoCard
-from .zedxmini import Zedxmini, ZedxminiSimulation
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .information import CameraInformation
+    from .manager import ZedxminiManager
+    from .recording import Recorder
+    from .replay import ZedxminiReplay
+    from .stereo_card import StereoCard
+    from .zedxmini import Zedxmini, ZedxminiSimulation
+
+# NOTE: exports are imported on first access, so that e.g. `zedxmini.information` or `zedxmini.frame_history`
+# can be used without NiceGUI and OpenCV, and applications only load the backends they use
+_SUBMODULES = {
+    'CameraInformation': 'information',
+    'Recorder': 'recording',
+    'Zedxmini': 'zedxmini',
+    'ZedxminiManager': 'manager',
+    'ZedxminiReplay': 'replay',
+    'ZedxminiSimulation': 'zedxmini',
+    'StereoCard': 'stereo_card',
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _SUBMODULES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(f'.{_SUBMODULES[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
+    'CameraInformation',
+    'Recorder',
     'Zedxmini',
-    'ZedxminiSimulation'
+    'ZedxminiManager',
+    'ZedxminiReplay',
+    'ZedxminiSimulation',
     'StereoCard',
 ]
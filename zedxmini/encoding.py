@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from collections.abc import Callable
+from contextlib import asynccontextmanager, nullcontext
+from multiprocessing.shared_memory import SharedMemory
+
+import cv2
+import numpy as np
+from nicegui import run
+
+from .metrics import Metrics
+from .scheduling import FairScheduler
+
+JPEG_QUALITY = 95
+MIN_OUTPUT_SIZE = 1024 * 1024
+
+log = logging.getLogger('zedxmini.encoding')
+
+# shared memory segments attached by this (worker) process, by name
+_attached: dict[str, SharedMemory] = {}
+
+
+def convert(rgba_image: np.ndarray, color=cv2.COLOR_BGRA2BGR, quality: int = JPEG_QUALITY, shrink: int = 1) -> bytes:
+    if shrink > 1:
+        height, width = rgba_image.shape[:2]
+        size = (max(width // shrink, 1), max(height // shrink, 1))  # NOTE: cv2.resize rejects empty images
+        rgba_image = cv2.resize(rgba_image, size, interpolation=cv2.INTER_AREA)
+    rgb_image = cv2.cvtColor(rgba_image, color)
+    _, jpeg_image = cv2.imencode('.jpg', rgb_image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    jpeg_image_bytes = jpeg_image.tobytes()
+    return jpeg_image_bytes
+
+
+def _noop() -> None:
+    pass
+
+
+def _attach(name: str) -> SharedMemory:
+    if name not in _attached:
+        if len(_attached) > 32:  # slots of an old size were replaced
+            for shared_memory in _attached.values():
+                shared_memory.close()
+            _attached.clear()
+        _attached[name] = SharedMemory(name=name)
+    return _attached[name]
+
+
+def encode_slot(name: str, shape: tuple[int, ...], dtype: str, output_offset: int,
+                quality: int, shrink: int) -> int:
+    """Encode the image in the given shared memory slot and write the JPEG behind it.
+
+    Runs in a worker process; returns the JPEG size or its negated size if it does not fit into the slot.
+    """
+    shared_memory = _attach(name)
+    image = np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf)
+    jpeg = convert(image, quality=quality, shrink=shrink)
+    if output_offset + len(jpeg) > shared_memory.size:
+        return -len(jpeg)
+    shared_memory.buf[output_offset:output_offset + len(jpeg)] = jpeg
+    return len(jpeg)
+
+
+class SharedMemoryEncoder:
+    """JPEG encoding in the process pool without pickling frames.
+
+    Each slot is a shared memory segment holding the raw image followed by room for the JPEG.
+    Workers only receive the slot name and image shape.
+    When all slots are busy, further encodings wait for one to be released;
+    cameras sharing one encoder get freed slots in turn.
+    """
+
+    def __init__(self, slot_count: int = 4, metrics: Metrics | None = None) -> None:
+        self.slot_count = slot_count
+        self.metrics = metrics
+        self.slots: list[SharedMemory | None] = [None] * slot_count
+        self.scheduler = FairScheduler(slot_count)
+        self._warm_up: asyncio.Task | None = None
+
+    @property
+    def busy_slots(self) -> int:
+        return self.scheduler.busy
+
+    @asynccontextmanager
+    async def _slot(self, size: int, owner: str):
+        with self._measure('encode_slot_wait'):
+            index = await self.scheduler.acquire(owner)
+        try:
+            shared_memory = self.slots[index]
+            if shared_memory is None or shared_memory.size < size:
+                if shared_memory is not None:
+                    shared_memory.close()
+                    shared_memory.unlink()
+                shared_memory = self.slots[index] = SharedMemory(create=True, size=size)
+            yield shared_memory
+        finally:
+            self.scheduler.release(index)
+
+    async def encode(self, image: np.ndarray, *, quality: int = JPEG_QUALITY, shrink: int = 1,
+                     owner: str = '', check: Callable[[], None] | None = None) -> bytes:
+        """Encode the image as JPEG.
+
+        The image is copied into a slot once one is free; `check` is called right after that copy
+        and may raise to abort if the image's buffer was reused while waiting.
+        """
+        output_offset = image.nbytes
+        async with self._slot(output_offset + max(image.nbytes // 2, MIN_OUTPUT_SIZE), owner) as shared_memory:
+            slot_image = np.ndarray(image.shape, dtype=image.dtype, buffer=shared_memory.buf)
+            np.copyto(slot_image, image)
+            if check is not None:
+                check()
+            with self._measure('encode_worker'):
+                size = await run.cpu_bound(encode_slot, shared_memory.name, image.shape, image.dtype.str,
+                                           output_offset, quality, shrink)
+            if size < 0:
+                log.warning('JPEG of %d bytes does not fit into the shared memory slot', -size)
+                return convert(slot_image, quality=quality, shrink=shrink)
+            return bytes(shared_memory.buf[output_offset:output_offset + size])
+
+    async def warm_up(self) -> None:
+        """Start the worker processes now rather than with the first encoding; cameras sharing the encoder wait once."""
+        if self._warm_up is None:
+            self._warm_up = asyncio.ensure_future(run.cpu_bound(_noop))
+        await self._warm_up
+
+    def _measure(self, stage: str):
+        return nullcontext() if self.metrics is None else self.metrics.measure(stage)
+
+    def close(self) -> None:
+        for shared_memory in self.slots:
+            if shared_memory is not None:
+                shared_memory.close()
+                shared_memory.unlink()
+        self.slots = [None] * self.slot_count
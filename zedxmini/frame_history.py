@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .zedxmini import Frame
+
+
+class FrameExpiredError(RuntimeError):
+    """The slot of a frame was reused while it was being read."""
+
+
+class FrameHistory:
+    """Ring buffer of the last `size` frames with lookup by timestamp.
+
+    Storage for every channel (view or measure) is allocated once as a (size, height, width, channels) array
+    and reused, so memory stays fixed no matter how long the camera runs.
+    A frame handed out remains valid until its slot is about to be overwritten `size` frames later;
+    writers evict the frame from its slot and bump the slot's generation first,
+    so readers holding a frame check `frame in history` after copying from it to detect a torn read.
+    Frames may be claimed and appended by a capture thread while the event loop reads them.
+    """
+
+    def __init__(self, size: int) -> None:
+        assert size > 0
+        self.size = size
+        self.frames: list[Frame | None] = [None] * size
+        # incremented whenever the frame of a slot is evicted
+        self.generations = [0] * size
+        self.next_index = 0
+        self._storage: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(frame is not None for frame in self.frames)
+
+    def evict(self) -> None:
+        """Drop the frame in the slot of the next frame; must be called before anything is written into that slot."""
+        with self._lock:
+            if self.frames[self.next_index] is not None:
+                self.frames[self.next_index] = None
+                self.generations[self.next_index] += 1
+
+    def claim(self, channel: str, shape: tuple[int, ...], dtype: np.dtype | type = np.uint8) -> np.ndarray:
+        """Return the buffer of the given channel for the next frame to be appended, evicting the frame it held."""
+        self.evict()
+        storage = self._storage.get(channel)
+        if storage is None or storage.shape[1:] != tuple(shape) or storage.dtype != dtype:
+            storage = self._storage[channel] = np.zeros((self.size, *shape), dtype=dtype)
+        return storage[self.next_index]
+
+    def __contains__(self, frame: Frame) -> bool:
+        """Whether the frame is still in the history, i.e. its buffers are not being reused."""
+        return frame.slot >= 0 and self.generations[frame.slot] == frame.generation
+
+    def append(self, frame: Frame) -> None:
+        self.evict()
+        with self._lock:
+            frame.slot = self.next_index
+            frame.generation = self.generations[self.next_index]
+            self.frames[self.next_index] = frame
+            self.next_index = (self.next_index + 1) % self.size
+
+    @property
+    def ordered(self) -> list[Frame]:
+        """All frames from oldest to newest."""
+        with self._lock:
+            frames = self.frames[self.next_index:] + self.frames[:self.next_index]
+        return [frame for frame in frames if frame is not None]
+
+    @property
+    def last(self) -> Frame | None:
+        with self._lock:
+            return self.frames[self.next_index - 1]
+
+    def find(self, timestamp: float, *, exact: bool = False) -> Frame | None:
+        """Find the frame with the given timestamp or, unless `exact` is set, the one closest to it."""
+        frames = self.ordered
+        if not frames:
+            return None
+        timestamps = [frame.timestamp for frame in frames]
+        index = bisect.bisect_left(timestamps, timestamp)
+        if index < len(frames) and timestamps[index] == timestamp:
+            return frames[index]
+        if exact:
+            return None
+        candidates = frames[max(index - 1, 0):index + 1]
+        return min(candidates, key=lambda frame: abs(frame.timestamp - timestamp))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(storage.nbytes for storage in self._storage.values())
@@ -0,0 +1,186 @@
+import logging
+import math
+from dataclasses import asdict, dataclass, replace
+
+import psutil
+import rosys
+
+from .zedxmini import DEPTH_MODES, ZedxminiBase
+
+log = logging.getLogger('zedxmini.governor')
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    # upper limit for the quality of encoded images
+    jpeg_quality: int
+    # minimal shrink factor of encoded images
+    shrink: int
+    depth_mode: str
+    fps: float
+
+
+def quality_levels(fps: float, depth_mode: str) -> tuple[QualityLevel, ...]:
+    """Levels from full quality downwards; cheap and invisible changes come first, reopening the camera last."""
+    cheaper_depth_mode = DEPTH_MODES[min(DEPTH_MODES.index(depth_mode) + 1, len(DEPTH_MODES) - 1)]
+    full = QualityLevel(jpeg_quality=100, shrink=1, depth_mode=depth_mode, fps=fps)
+    levels = [
+        full,
+        replace(full, jpeg_quality=85),
+        replace(full, jpeg_quality=75),
+        replace(full, jpeg_quality=75, shrink=2),
+        replace(full, jpeg_quality=75, shrink=2, depth_mode=cheaper_depth_mode),
+        replace(full, jpeg_quality=75, shrink=2, depth_mode=cheaper_depth_mode, fps=fps / 2),
+        replace(full, jpeg_quality=60, shrink=4, depth_mode=cheaper_depth_mode, fps=fps / 2),
+    ]
+    return tuple(level for i, level in enumerate(levels) if i == 0 or level != levels[i - 1])
+
+
+@dataclass
+class GovernorSample:
+    # achieved capture rate relative to the configured one
+    fps_ratio: float = float('nan')
+    # quantile of the encode latency during the last interval in seconds
+    encode_latency: float = float('nan')
+    cpu_percent: float = float('nan')
+    overloaded: bool = False
+
+
+class QualityGovernor:
+    """Steps JPEG quality, encode resolution, depth mode and frame rate of a camera down under load and back up.
+
+    Every `interval` seconds it samples the encode latency quantile of that interval, the achieved frame rate
+    and the CPU load of the host.
+    After `patience` overloaded samples in a row it moves one level down,
+    after `recovery` samples with clear headroom one level up.
+    Levels changing the depth mode or frame rate reopen the camera;
+    automatic steps do so at most once per `reopen_cooldown` seconds.
+    """
+
+    def __init__(self, camera: ZedxminiBase, *, levels: tuple[QualityLevel, ...] | None = None,
+                 target_latency: float = 0.1, quantile: float = 0.9, min_fps_ratio: float = 0.8,
+                 max_cpu_percent: float = 90.0, interval: float = 1.0, patience: int = 3, recovery: int = 10,
+                 reopen_cooldown: float = 30.0, enabled: bool = True) -> None:
+        self.camera = camera
+        self.levels = levels or quality_levels(camera.fps, camera.depth_mode)
+        self.target_latency = target_latency
+        self.quantile = quantile
+        self.min_fps_ratio = min_fps_ratio
+        self.max_cpu_percent = max_cpu_percent
+        self.patience = patience
+        self.recovery = recovery
+        self.reopen_cooldown = reopen_cooldown
+        self.enabled = enabled
+        self.level = 0
+        # a level change is in progress, which may take seconds if it reopens the camera
+        self.is_changing = False
+        self.sample = GovernorSample()
+        self._overloaded_count = 0
+        self._headroom_count = 0
+        self._last_reopen = float('-inf')
+        self._encode_snapshot: list[int] | None = None
+        self._cpu_times = psutil.cpu_times()
+
+        self.LEVEL_CHANGED = rosys.event.Event()
+        """the quality level has changed (argument: QualityLevel)"""
+
+        camera.metrics.gauge('governor_level', lambda: self.level)
+        rosys.on_repeat(self.step, interval)
+
+    @property
+    def current(self) -> QualityLevel:
+        return self.levels[self.level]
+
+    def to_dict(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'level': self.level,
+            'levels': [asdict(level) for level in self.levels],
+            'target_latency': self.target_latency,
+            'sample': {key: None if isinstance(value, float) and math.isnan(value) else value
+                       for key, value in asdict(self.sample).items()},
+        }
+
+    async def step(self) -> None:
+        if not self.camera.is_ready:
+            return  # NOTE: a camera which is (re)opening delivers no frames, which must not count as overload
+        self.sample = self._measure()
+        if not self.enabled:
+            return
+        if self.sample.overloaded:
+            self._overloaded_count += 1
+            self._headroom_count = 0
+        elif self._has_headroom(self.sample):
+            self._headroom_count += 1
+            self._overloaded_count = 0
+        else:
+            self._overloaded_count = self._headroom_count = 0
+        if self._overloaded_count >= self.patience and self.level < len(self.levels) - 1:
+            level = self.level + 1
+        elif self._headroom_count >= self.recovery and self.level > 0:
+            level = self.level - 1
+        else:
+            return
+        if self._needs_reopen(self.levels[level]) and rosys.time() - self._last_reopen < self.reopen_cooldown:
+            return
+        await self.set_level(level)
+
+    async def set_level(self, level: int) -> bool:
+        """Apply the given level; returns False if the camera could not be reconfigured.
+
+        Requests arriving while another level change is in progress are rejected, since they would reopen the camera
+        once more.
+        """
+        if self.is_changing:
+            return False
+        level = min(max(level, 0), len(self.levels) - 1)
+        target = self.levels[level]
+        if self._needs_reopen(target):
+            self._last_reopen = rosys.time()
+            self.is_changing = True
+            try:
+                success = await self.camera.reconfigure(fps=target.fps, depth_mode=target.depth_mode)
+            finally:
+                self.is_changing = False
+            if not success:
+                log.warning('%s: could not switch to %s', self.camera.name, target)
+                return False
+        self.camera.max_jpeg_quality = target.jpeg_quality
+        self.camera.min_shrink = target.shrink
+        if level != self.level:
+            log.info('%s: quality level %d -> %d (%s)', self.camera.name, self.level, level, target)
+        self.level = level
+        self._overloaded_count = self._headroom_count = 0
+        self.LEVEL_CHANGED.emit(target)
+        return True
+
+    def _needs_reopen(self, level: QualityLevel) -> bool:
+        return (level.fps, level.depth_mode) != (self.camera.fps, self.camera.depth_mode)
+
+    def _measure(self) -> GovernorSample:
+        histogram = self.camera.metrics.histograms.get('encode')
+        latency = float('nan')
+        if histogram is not None:
+            if self._encode_snapshot is not None:
+                latency = histogram.quantile(self.quantile, since=self._encode_snapshot)
+            self._encode_snapshot = histogram.snapshot()
+        fps_ratio = self.camera.capture_statistics.fps / self.camera.fps if math.isfinite(self.camera.fps) else 1.0
+        cpu_percent = self._cpu_percent()
+        overloaded = latency > self.target_latency or fps_ratio < self.min_fps_ratio or \
+            cpu_percent > self.max_cpu_percent
+        return GovernorSample(fps_ratio=fps_ratio, encode_latency=latency, cpu_percent=cpu_percent,
+                              overloaded=overloaded)
+
+    def _has_headroom(self, sample: GovernorSample) -> bool:
+        # NOTE: NaN compares false, so an interval without encodings does not count against the latency
+        return not sample.encode_latency > self.target_latency / 2 and \
+            sample.fps_ratio >= (1 + self.min_fps_ratio) / 2 and \
+            sample.cpu_percent < self.max_cpu_percent - 20
+
+    def _cpu_percent(self) -> float:
+        """Host CPU load since the last call; tracked per governor since psutil's own state is process-wide."""
+        times = psutil.cpu_times()
+        total = sum(times) - sum(self._cpu_times)
+        idle = times.idle - self._cpu_times.idle
+        self._cpu_times = times
+        return 100.0 * (1 - idle / total) if total > 0 else float('nan')
@@ -0,0 +1,122 @@
+"""Immutable snapshot of a camera's identity and calibration in the format of camera_information.json."""
+import json
+from dataclasses import asdict, dataclass, fields, replace
+from functools import cached_property
+from pathlib import Path
+from typing import Any
+
+# order of the SDK's `disto` coefficients
+DISTORTION_KEYS = ('k1', 'k2', 'p1', 'p2', 'k3', 'k4', 'k5', 'k6', 's1', 's2', 's3', 's4')
+
+
+@dataclass(frozen=True)
+class CameraParameters:
+    fx: float
+    fy: float
+    cx: float
+    cy: float
+    k1: float = 0.0
+    k2: float = 0.0
+    p1: float = 0.0
+    p2: float = 0.0
+    k3: float = 0.0
+    k4: float = 0.0
+    k5: float = 0.0
+    k6: float = 0.0
+    s1: float = 0.0
+    s2: float = 0.0
+    s3: float = 0.0
+    s4: float = 0.0
+    fov_vertical: float = 0.0
+    fov_horizontal: float = 0.0
+    fov_diagonal: float = 0.0
+
+    @staticmethod
+    def from_sdk(parameters: Any) -> 'CameraParameters':
+        return CameraParameters(fx=parameters.fx, fy=parameters.fy, cx=parameters.cx, cy=parameters.cy,
+                                **dict(zip(DISTORTION_KEYS, (float(v) for v in parameters.disto))),
+                                fov_vertical=parameters.v_fov, fov_horizontal=parameters.h_fov,
+                                fov_diagonal=parameters.d_fov)
+
+    @staticmethod
+    def from_dict(data: dict) -> 'CameraParameters':
+        return CameraParameters(**{field.name: data[field.name] for field in fields(CameraParameters)
+                                   if field.name in data})
+
+    def scaled(self, scale_x: float, scale_y: float) -> 'CameraParameters':
+        return replace(self, fx=self.fx * scale_x, cx=self.cx * scale_x, fy=self.fy * scale_y, cy=self.cy * scale_y)
+
+
+@dataclass(frozen=True)
+class Calibration:
+    # distance between the optical centers in millimeters
+    baseline: float
+    left_cam: CameraParameters
+    right_cam: CameraParameters
+
+
+@dataclass(frozen=True)
+class CameraInformation:
+    """Taken once when a camera is opened and passed around as is, so serving it costs nothing."""
+    camera_model: str
+    serial_number: int | str
+    camera_firmware: int | str
+    sensors_firmware: int | str
+    resolution: tuple[int, int]
+    fps: float
+    calibration: Calibration
+
+    @staticmethod
+    def from_sdk(information: Any) -> 'CameraInformation':
+        """Walk the SDK's camera information once."""
+        configuration = information.camera_configuration
+        parameters = configuration.calibration_parameters
+        return CameraInformation(
+            camera_model=str(information.camera_model),
+            serial_number=information.serial_number,
+            camera_firmware=configuration.firmware_version,
+            sensors_firmware=information.sensors_configuration.firmware_version,
+            resolution=(configuration.resolution.width, configuration.resolution.height),
+            fps=configuration.fps,
+            calibration=Calibration(baseline=parameters.get_camera_baseline(),
+                                    left_cam=CameraParameters.from_sdk(parameters.left_cam),
+                                    right_cam=CameraParameters.from_sdk(parameters.right_cam)),
+        )
+
+    @staticmethod
+    def from_dict(data: dict) -> 'CameraInformation':
+        calibration = data['calibration']
+        return CameraInformation(
+            camera_model=data['camera_model'],
+            serial_number=data['serial_number'],
+            camera_firmware=data['camera_firmware'],
+            sensors_firmware=data['sensors_firmware'],
+            resolution=(int(data['resolution'][0]), int(data['resolution'][1])),
+            fps=data['fps'],
+            calibration=Calibration(baseline=calibration['baseline'],
+                                    left_cam=CameraParameters.from_dict(calibration['left_cam']),
+                                    right_cam=CameraParameters.from_dict(calibration['right_cam'])),
+        )
+
+    @staticmethod
+    def load(path: Path) -> 'CameraInformation':
+        return CameraInformation.from_dict(json.loads(path.read_text()))
+
+    def save(self, path: Path) -> None:
+        path.write_text(json.dumps(self.to_dict(), indent=2) + '\n')
+
+    def to_dict(self) -> dict:
+        """A new mutable copy in the format of camera_information.json."""
+        return asdict(self)
+
+    @cached_property
+    def encoded(self) -> bytes:
+        """JSON to serve as is."""
+        return json.dumps(self.to_dict()).encode()
+
+    def scaled(self, width: int, height: int) -> 'CameraInformation':
+        """The same camera at another resolution."""
+        scale_x, scale_y = width / self.resolution[0], height / self.resolution[1]
+        calibration = replace(self.calibration, left_cam=self.calibration.left_cam.scaled(scale_x, scale_y),
+                              right_cam=self.calibration.right_cam.scaled(scale_x, scale_y))
+        return replace(self, resolution=(width, height), calibration=calibration)
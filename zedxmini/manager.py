@@ -0,0 +1,38 @@
+from .encoding import SharedMemoryEncoder
+from .metrics import Metrics
+from .scheduling import FairScheduler
+from .zedxmini import Zedxmini, ZedxminiBase, ZedxminiSimulation, import_sdk
+
+
+class ZedxminiManager:
+    """Opens several cameras by serial number, e.g. on a ZED Link Duo, within one process.
+
+    Each camera captures in its own thread (or timer for the simulation).
+    All of them share one JPEG encoder and one point cloud worker pool,
+    whose slots are handed to the cameras in turn so that a busy camera cannot starve the others.
+    """
+
+    def __init__(self, serial_numbers: list[int] | None = None, *, simulation: bool = False, history_size: int = 5,
+                 fps: int = 30, encoder_slots: int = 4, point_cloud_workers: int = 1) -> None:
+        if serial_numbers is None:
+            serial_numbers = [1, 2] if simulation else self.list_serial_numbers()
+        self.metrics = Metrics('shared')
+        self.encoder = SharedMemoryEncoder(encoder_slots, metrics=self.metrics)
+        self.point_cloud_scheduler = FairScheduler(point_cloud_workers)
+        self.cameras: dict[str, ZedxminiBase] = {}
+        for serial_number in serial_numbers:
+            camera_type = ZedxminiSimulation if simulation else Zedxmini
+            self.cameras[str(serial_number)] = camera_type(history_size, serial_number=serial_number, fps=fps,
+                                                           encoder=self.encoder,
+                                                           point_cloud_scheduler=self.point_cloud_scheduler)
+        self.metrics.gauge('encoder_busy_slots', lambda: self.encoder.busy_slots)
+        self.metrics.gauge('encoder_waiting', lambda: self.encoder.scheduler.waiting)
+        self.metrics.gauge('point_cloud_waiting', lambda: self.point_cloud_scheduler.waiting)
+
+    @staticmethod
+    def list_serial_numbers() -> list[int]:
+        """Serial numbers of all connected cameras."""
+        sl = import_sdk()
+        if sl is None:
+            return []
+        return [device.serial_number for device in sl.Camera.get_device_list()]
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Cumulative latency histogram in seconds, safe to observe from the capture thread."""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> list[int]:
+        """Bucket counts so far, to compute quantiles of later observations only."""
+        with self._lock:
+            return list(self.counts)
+
+    def quantile(self, q: float, since: list[int] | None = None) -> float:
+        """Estimate a quantile by linear interpolation within its bucket, like Prometheus' histogram_quantile.
+
+        With a `snapshot()` as `since`, only observations made after it are taken into account.
+        """
+        with self._lock:
+            counts = self.counts if since is None else [count - old for count, old in zip(self.counts, since)]
+            total = sum(counts)
+            if total == 0:
+                return float('nan')
+            rank = q * total
+            cumulative = 0
+            for index, count in enumerate(counts):
+                if cumulative + count >= rank and count > 0:
+                    lower = self.buckets[index - 1] if index > 0 else 0.0
+                    upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                    return lower + (upper - lower) * (rank - cumulative) / count
+                cumulative += count
+            return self.buckets[-1]
+
+
+class Metrics:
+    """Per-stage latency histograms, counters and gauges of one camera.
+
+    Gauges are callables evaluated when the metrics are rendered, as are counters kept elsewhere
+    (e.g. the capture statistics) which are registered with `counter()`.
+    """
+
+    def __init__(self, camera: str) -> None:
+        self.camera = camera
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, float] = {}
+        self.gauges: dict[str, Callable[[], float]] = {}
+        self.counter_getters: dict[str, Callable[[], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if stage not in self.histograms:
+            with self._lock:
+                self.histograms.setdefault(stage, Histogram())
+        self.histograms[stage].observe(seconds)
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def increment(self, counter: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def gauge(self, name: str, getter: Callable[[], float]) -> None:
+        self.gauges[name] = getter
+
+    def counter(self, name: str, getter: Callable[[], float]) -> None:
+        """Export a monotonically increasing value as the counter `zedxmini_<name>_total`."""
+        self.counter_getters[name] = getter
+
+    def counter_values(self) -> dict[str, float]:
+        """Incremented and registered counters by name."""
+        with self._lock:
+            values = dict(self.counters)
+        values.update((name, float(getter())) for name, getter in self.counter_getters.items())
+        return values
+
+    @property
+    def encode_cache_hit_rate(self) -> float:
+        hits = self.counters.get('encode_cache_hits', 0)
+        total = hits + self.counters.get('encode_cache_misses', 0)
+        return hits / total if total else float('nan')
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        return render_metrics([self])
+
+    def families(self) -> dict[str, tuple[str, list[str]]]:
+        """Sample lines by metric family name, along with the family's type."""
+        camera = f'camera="{self.camera}"'
+        families: dict[str, tuple[str, list[str]]] = {}
+        lines = families.setdefault('zedxmini_stage_seconds', ('histogram', []))[1]
+        for stage, histogram in sorted(self.histograms.items()):
+            labels = f'{camera},stage="{stage}"'
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, float('inf')), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'zedxmini_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'zedxmini_stage_seconds_sum{{{labels}}} {histogram.sum}')
+            lines.append(f'zedxmini_stage_seconds_count{{{labels}}} {histogram.count}')
+        for counter, value in sorted(self.counter_values().items()):
+            families[f'zedxmini_{counter}_total'] = ('counter', [f'zedxmini_{counter}_total{{{camera}}} {value}'])
+        for name, getter in sorted(self.gauges.items()):
+            families[f'zedxmini_{name}'] = ('gauge', [f'zedxmini_{name}{{{camera}}} {float(getter())}'])
+        return families
+
+    def summary(self) -> list[str]:
+        """Human readable lines for the UI."""
+        lines = [f'{stage}: p50 {1000 * histogram.quantile(0.5):.1f} ms, p99 {1000 * histogram.quantile(0.99):.1f} ms'
+                 for stage, histogram in sorted(self.histograms.items())]
+        lines += [f'{counter}: {value:.0f}' for counter, value in sorted(self.counter_values().items())]
+        lines += [f'{name}: {float(getter()):.2f}' for name, getter in sorted(self.gauges.items())]
+        lines.append(f'encode cache hit rate: {self.encode_cache_hit_rate:.2f}')
+        return lines
+
+
+def render_metrics(metrics: Iterable[Metrics]) -> str:
+    """Prometheus text exposition of several cameras; samples of one family must stay together."""
+    families: dict[str, tuple[str, list[str]]] = {}
+    for camera_metrics in metrics:
+        for name, (kind, lines) in camera_metrics.families().items():
+            families.setdefault(name, (kind, []))[1].extend(lines)
+    output = []
+    for name, (kind, lines) in families.items():
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(lines)
+    return '\n'.join(output) + '\n'
@@ -0,0 +1,136 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from .points import MILLIMETERS, voxel_downsample
+
+
+@dataclass
+class GroundPlane:
+    # unit normal in camera coordinates (x right, y down, z forward), pointing from the ground towards the camera
+    normal: tuple[float, float, float]
+    # camera height above the plane in meters
+    offset: float
+    inlier_ratio: float
+
+    def height(self, points: np.ndarray) -> np.ndarray:
+        """Signed height of (N, 3) points above the plane in meters."""
+        return points @ np.asarray(self.normal, dtype=points.dtype) + self.offset
+
+    def to_dict(self) -> dict:
+        return {'normal': list(self.normal), 'offset': self.offset, 'inlier_ratio': self.inlier_ratio}
+
+
+@dataclass
+class HeightGrid:
+    """Highest point above the ground per cell of a grid in the camera's x-z plane."""
+    resolution: float
+    x_min: float
+    z_min: float
+    # (rows along z, columns along x) in meters, NaN where nothing was observed
+    heights: np.ndarray
+
+    def occupied(self, min_height: float) -> np.ndarray:
+        with np.errstate(invalid='ignore'):
+            return self.heights >= min_height
+
+    def to_dict(self) -> dict:
+        return {
+            'resolution': self.resolution,
+            'x_min': self.x_min,
+            'z_min': self.z_min,
+            'heights': [[None if np.isnan(h) else float(h) for h in row] for row in self.heights],
+        }
+
+
+@dataclass
+class PointCloudAnalysis:
+    timestamp: float
+    # voxel centroids in meters (N x 3)
+    points: np.ndarray
+    ground: GroundPlane | None
+    grid: HeightGrid | None
+
+
+class PointCloudProcessor:
+    """Reduces an XYZ measure to a voxel cloud, a robust ground plane and an obstacle height grid.
+
+    Work buffers are kept between frames; calls are serialized, so run it in a thread off the event loop.
+    The ground is fitted by RANSAC over planes tilted less than `max_tilt` degrees from horizontal
+    and refined by least squares on the inliers.
+    """
+
+    def __init__(self, *, stride: int = 2, voxel_size: float = 0.05, iterations: int = 64,
+                 threshold: float = 0.03, max_tilt: float = 30.0,
+                 grid_resolution: float = 0.1, grid_width: float = 8.0, grid_depth: float = 8.0,
+                 seed: int = 0) -> None:
+        self.stride = stride
+        self.voxel_size = voxel_size
+        self.iterations = iterations
+        self.threshold = threshold
+        self.min_cos_tilt = float(np.cos(np.radians(max_tilt)))
+        self.grid_resolution = grid_resolution
+        self.grid_shape = (int(np.ceil(grid_depth / grid_resolution)), int(np.ceil(grid_width / grid_resolution)))
+        self.grid_x_min = -grid_width / 2
+        self.rng = np.random.default_rng(seed)
+        self._points = np.empty((0, 0, 3), dtype=np.float32)
+        self._distances = np.empty((0, iterations), dtype=np.float32)
+        self._grid = np.empty(self.grid_shape[0] * self.grid_shape[1], dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def process(self, xyz: np.ndarray, timestamp: float, *, stride: int | None = None) -> PointCloudAnalysis:
+        """Analyze every `stride`th pixel (default: the processor's stride) of an XYZ(A) measure in millimeters."""
+        stride = self.stride if stride is None else stride
+        with self._lock:
+            sampled = xyz[::stride, ::stride, :3]
+            if self._points.shape != sampled.shape:
+                self._points = np.empty(sampled.shape, dtype=np.float32)
+            np.multiply(sampled, np.float32(MILLIMETERS), out=self._points)
+            points = voxel_downsample(self._points, self.voxel_size)
+            ground = self._fit_ground(points)
+            grid = None if ground is None else self._height_grid(points, ground)
+            return PointCloudAnalysis(timestamp=timestamp, points=points, ground=ground, grid=grid)
+
+    def _fit_ground(self, points: np.ndarray) -> GroundPlane | None:
+        if len(points) < 3:
+            return None
+        samples = points[self.rng.integers(0, len(points), (self.iterations, 3))]
+        normals = np.cross(samples[:, 1] - samples[:, 0], samples[:, 2] - samples[:, 0])
+        lengths = np.linalg.norm(normals, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            normals /= lengths[:, None]
+        normals[normals[:, 1] > 0] *= -1  # point up, i.e. towards negative y
+        candidates = np.nan_to_num(-normals[:, 1]) >= self.min_cos_tilt
+        if not candidates.any():
+            return None
+        normals = normals[candidates]
+        offsets = -np.einsum('ij,ij->i', normals, samples[candidates, 0])
+
+        if self._distances.shape[0] < len(points):
+            self._distances = np.empty((len(points), self.iterations), dtype=np.float32)
+        distances = self._distances[:len(points), :len(normals)]
+        np.matmul(points, normals.T, out=distances)
+        distances += offsets
+        np.abs(distances, out=distances)
+        best = int(np.argmax((distances < self.threshold).sum(axis=0)))
+        inliers = points[distances[:, best] < self.threshold]
+
+        centroid = inliers.mean(axis=0)
+        normal = np.linalg.svd(inliers - centroid, full_matrices=False)[2][2]
+        if normal[1] > 0:
+            normal = -normal
+        offset = -float(normal @ centroid)
+        return GroundPlane(normal=(float(normal[0]), float(normal[1]), float(normal[2])), offset=offset,
+                           inlier_ratio=len(inliers) / len(points))
+
+    def _height_grid(self, points: np.ndarray, ground: GroundPlane) -> HeightGrid:
+        rows, columns = self.grid_shape
+        row = np.floor(points[:, 2] / self.grid_resolution).astype(np.intp)
+        column = np.floor((points[:, 0] - self.grid_x_min) / self.grid_resolution).astype(np.intp)
+        inside = (row >= 0) & (row < rows) & (column >= 0) & (column < columns)
+        self._grid.fill(-np.inf)
+        np.maximum.at(self._grid, row[inside] * columns + column[inside], ground.height(points[inside]))
+        heights = self._grid.reshape(rows, columns).copy()
+        heights[heights == -np.inf] = np.nan
+        return HeightGrid(resolution=self.grid_resolution, x_min=self.grid_x_min, z_min=0.0, heights=heights)
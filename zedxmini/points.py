@@ -0,0 +1,106 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+from rosys.geometry import Point3d
+
+# the ZED SDK measures XYZ in millimeters (InitParameters.coordinate_units default)
+MILLIMETERS = 0.001
+# smaller voxels than the measurement unit only cost time, and their keys would overflow for large clouds
+MIN_VOXEL_SIZE = MILLIMETERS
+
+
+@dataclass
+class BoxStatistics:
+    box: tuple[int, int, int, int]
+    median_depth: float | None
+    valid_ratio: float
+    centroid: Point3d | None
+
+    def to_dict(self) -> dict:
+        return {
+            'box': list(self.box),
+            'median_depth': self.median_depth,
+            'valid_ratio': self.valid_ratio,
+            'centroid': None if self.centroid is None else list(self.centroid.tuple),
+        }
+
+
+def gather_points(xyz: np.ndarray, pixels: np.ndarray | Sequence[Sequence[int]]) -> np.ndarray:
+    """Look up many pixels at once in a (height, width, >=3) XYZ measure.
+
+    Returns an (N, 3) array in meters; pixels outside the image or without valid depth are NaN.
+    """
+    pixels = np.asarray(pixels, dtype=np.intp).reshape(-1, 2)
+    height, width = xyz.shape[:2]
+    x, y = pixels[:, 0], pixels[:, 1]
+    inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    points = np.full((len(pixels), 3), np.nan, dtype=np.float32)
+    points[inside] = xyz[y[inside], x[inside], :3]
+    points[~np.isfinite(points).all(axis=1)] = np.nan
+    return points * MILLIMETERS
+
+
+def clip_box(box: Sequence[int], width: int, height: int) -> tuple[int, int, int, int]:
+    """Order the corners of an (x0, y0, x1, y1) box and clip it to the image; it may become empty."""
+    x0, y0, x1, y1 = (int(v) for v in box)
+    x0, x1 = np.clip(sorted((x0, x1)), 0, width).tolist()
+    y0, y1 = np.clip(sorted((y0, y1)), 0, height).tolist()
+    return x0, y0, x1, y1
+
+
+def box_statistics(xyz: np.ndarray, box: Sequence[int]) -> BoxStatistics:
+    """Robust depth statistics of the valid points inside the box (x0, y0, x1, y1), exclusive end."""
+    height, width = xyz.shape[:2]
+    x0, y0, x1, y1 = clip_box(box, width, height)
+    region = xyz[y0:y1, x0:x1, :3]
+    if region.size == 0:
+        return BoxStatistics(box=(x0, y0, x1, y1), median_depth=None, valid_ratio=0.0, centroid=None)
+    valid = np.isfinite(region).all(axis=2)
+    points = region[valid]
+    valid_ratio = float(valid.mean())
+    if len(points) == 0:
+        return BoxStatistics(box=(x0, y0, x1, y1), median_depth=None, valid_ratio=valid_ratio, centroid=None)
+    centroid = np.median(points, axis=0) * MILLIMETERS
+    return BoxStatistics(
+        box=(x0, y0, x1, y1),
+        median_depth=float(centroid[2]),
+        valid_ratio=valid_ratio,
+        centroid=Point3d(x=float(centroid[0]), y=float(centroid[1]), z=float(centroid[2])),
+    )
+
+
+def depth_map(xyz: np.ndarray, stride: int = 1) -> np.ndarray:
+    """Depth of every `stride`th pixel as uint16 millimeters; 0 where invalid or out of range."""
+    z = xyz[::stride, ::stride, 2]
+    with np.errstate(invalid='ignore'):
+        valid = (z > 0) & (z <= np.iinfo(np.uint16).max)  # NaN and inf compare False
+    depth = np.zeros(z.shape, dtype=np.uint16)
+    np.rint(z, out=depth, where=valid, casting='unsafe')
+    return depth
+
+
+def point_cloud(xyz: np.ndarray, stride: int = 1, dtype: np.dtype | type = np.float32) -> np.ndarray:
+    """Organized (height, width, 3) point cloud of every `stride`th pixel in meters, NaN where invalid."""
+    points = xyz[::stride, ::stride, :3] * np.float32(MILLIMETERS)
+    points[~np.isfinite(points).all(axis=2)] = np.nan
+    return points.astype(dtype, copy=False)
+
+
+def voxel_downsample(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """Replace all valid points within each cube of `voxel_size` by their centroid; returns an (N, 3) array."""
+    points = points.reshape(-1, 3)
+    points = points[np.isfinite(points).all(axis=1)]
+    if len(points) == 0:
+        return np.empty((0, 3), dtype=points.dtype)
+    voxels = np.floor(points / voxel_size).astype(np.int64)
+    voxels -= voxels.min(axis=0)
+    extent = voxels.max(axis=0) + 1
+    if int(extent[0]) * int(extent[1]) * int(extent[2]) < 2**63:
+        keys = (voxels[:, 0] * extent[1] + voxels[:, 1]) * extent[2] + voxels[:, 2]  # faster than unique(axis=0)
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    else:  # NOTE: packed keys would overflow and merge distant voxels
+        _, inverse, counts = np.unique(voxels, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+    centroids = np.stack([np.bincount(inverse, weights=points[:, i]) for i in range(3)], axis=1) / counts[:, None]
+    return centroids.astype(points.dtype)
@@ -0,0 +1,192 @@
+"""Append-only on-disk recording format.
+
+A recording is a directory with
+- `information.json`: the `get_camera_information()` dict of the recorded camera,
+- `chunk_00000.bin`, `chunk_00001.bin`, ...: raw arrays and JPEGs back to back, each aligned to `ALIGNMENT` bytes,
+- `index.jsonl`: one line per frame with its timestamps and where each channel lives in the chunks.
+
+Index lines are only written after the frame data, so a recording cut off by a crash stays readable.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+from collections.abc import Callable, Collection
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, TYPE_CHECKING
+
+import numpy as np
+
+from .encoding import JPEG_QUALITY, convert
+from .subscriptions import CHANNELS
+
+if TYPE_CHECKING:
+    from .zedxmini import Frame, ZedxminiBase
+
+INFORMATION_FILE = 'information.json'
+INDEX_FILE = 'index.jsonl'
+CHUNK_SIZE = 256 * 1024 * 1024
+ALIGNMENT = 64
+# views which may be stored as JPEG; measures are always stored raw
+JPEG_VIEWS = ('left', 'right', 'depth')
+
+log = logging.getLogger('zedxmini.recording')
+
+
+def chunk_path(path: Path, chunk: int) -> Path:
+    return path / f'chunk_{chunk:05d}.bin'
+
+
+def read_index(path: Path) -> list[dict]:
+    with (path / INDEX_FILE).open() as index:
+        return [json.loads(line) for line in index if line.strip()]
+
+
+@dataclass
+class RecorderStatistics:
+    frames: int = 0
+    # frames not written because the writer fell behind
+    dropped: int = 0
+    bytes: int = 0
+
+
+class Recorder:
+    """Streams the frames of a camera to disk from a background writer thread.
+
+    The capture thread only enqueues the frame; encoding and writing happen in the writer.
+    The queue is shorter than the frame history, so queued buffers are not reused before they are written.
+    If the writer falls behind, new frames are dropped instead of stalling the grab loop.
+    Frames whose slot generation changed while they were written are discarded again, since they may be torn.
+    """
+
+    def __init__(self, camera: ZedxminiBase, path: Path | str, *,
+                 channels: Collection[str] = ('left', 'right', 'depth', 'xyz'),
+                 jpeg: bool = False, quality: int = JPEG_QUALITY, chunk_size: int = CHUNK_SIZE) -> None:
+        for channel in channels:
+            if channel not in CHANNELS:
+                raise ValueError(f'unknown channel "{channel}"')
+        assert camera.frame_history.size >= 3, 'the writer needs at least one queued frame besides the current one'
+        self.camera = camera
+        self.path = Path(path)
+        self.channels = tuple(channels)
+        self.jpeg = jpeg
+        self.quality = quality
+        self.chunk_size = chunk_size
+        self.statistics = RecorderStatistics()
+        self._queue: queue.Queue[Frame | None] = queue.Queue(maxsize=camera.frame_history.size - 2)
+        self._thread: threading.Thread | None = None
+        self._unsubscribes: list[Callable[[], None]] = []
+        self._chunk = 0
+        self._chunk_file: IO[bytes] | None = None
+        self._index_file: IO[str] | None = None
+        camera.metrics.counter('recorder_frames', lambda: self.statistics.frames)
+        camera.metrics.counter('recorder_dropped_frames', lambda: self.statistics.dropped)
+        camera.metrics.gauge('recorder_queue', self._queue.qsize)
+
+    @property
+    def is_recording(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self.is_recording:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        if (self.path / INDEX_FILE).exists():
+            raise FileExistsError(f'{self.path} already contains a recording')
+        (self.path / INFORMATION_FILE).write_text(json.dumps(self.camera.get_camera_information(), indent=2))
+        self._chunk = 0
+        self._chunk_file = chunk_path(self.path, self._chunk).open('ab')
+        self._index_file = (self.path / INDEX_FILE).open('a')
+        self._unsubscribes = [self.camera.subscriptions.subscribe(channel) for channel in self.channels]
+        self._thread = threading.Thread(target=self._write_frames, name=f'{self.camera.name} recorder', daemon=True)
+        self._thread.start()
+        self.camera.frame_sinks.append(self._put)
+        log.info('recording %s to %s', ', '.join(self.channels), self.path)
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self.camera.frame_sinks.remove(self._put)
+        for unsubscribe in self._unsubscribes:
+            unsubscribe()
+        self._unsubscribes.clear()
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+        for file in (self._chunk_file, self._index_file):
+            if file is not None:
+                file.close()
+        self._chunk_file = self._index_file = None
+        log.info('recorded %d frames (%d dropped) to %s', self.statistics.frames, self.statistics.dropped, self.path)
+
+    def _put(self, frame: Frame) -> None:
+        try:
+            self._queue.put_nowait(frame)
+        except queue.Full:
+            self.statistics.dropped += 1
+
+    def _write_frames(self) -> None:
+        while (frame := self._queue.get()) is not None:
+            try:
+                with self.camera.metrics.measure('record'):
+                    self._write_frame(frame)
+            except Exception:
+                log.exception('could not record frame %s', frame.timestamp)
+                self.statistics.dropped += 1
+
+    def _write_frame(self, frame: Frame) -> None:
+        if frame not in self.camera.frame_history:
+            self.statistics.dropped += 1
+            return
+        assert self._chunk_file is not None
+        start = (self._chunk, self._chunk_file.tell())
+        entries = {}
+        for channel in self.channels:
+            array = frame.get_channel(channel)
+            if array is None:
+                continue
+            if self.jpeg and channel in JPEG_VIEWS:
+                data: bytes | memoryview = convert(array, quality=self.quality)
+                entry = {'encoding': 'jpeg', 'shape': list(array.shape), 'dtype': array.dtype.str}
+            else:
+                data = np.ascontiguousarray(array).data
+                entry = {'encoding': 'raw', 'shape': list(array.shape), 'dtype': array.dtype.str}
+            entries[channel] = {**entry, **self._write(data)}
+        # NOTE: the capture thread evicts a frame and bumps its slot's generation before it reuses the buffers,
+        # so this also catches an overwrite which is still in progress
+        if frame not in self.camera.frame_history:
+            self._rewind(*start)
+            self.statistics.dropped += 1
+            return
+        assert self._index_file is not None
+        line = {'timestamp': frame.timestamp, 'received': frame.received, 'channels': entries}
+        self._index_file.write(json.dumps(line) + '\n')
+        self._index_file.flush()
+        self.statistics.frames += 1
+
+    def _write(self, data: bytes | memoryview) -> dict:
+        assert self._chunk_file is not None
+        nbytes = memoryview(data).nbytes
+        offset = self._chunk_file.tell()
+        if offset > 0 and offset + nbytes > self.chunk_size:
+            self._chunk_file.close()
+            self._chunk += 1
+            self._chunk_file = chunk_path(self.path, self._chunk).open('ab')
+            offset = 0
+        self._chunk_file.write(data)
+        padding = -nbytes % ALIGNMENT
+        self._chunk_file.write(bytes(padding))
+        self._chunk_file.flush()
+        self.statistics.bytes += nbytes + padding
+        return {'chunk': self._chunk, 'offset': offset, 'nbytes': nbytes}
+
+    def _rewind(self, chunk: int, offset: int) -> None:
+        """Discard data written after the given position of the current chunk."""
+        assert self._chunk_file is not None
+        if chunk == self._chunk:
+            self.statistics.bytes -= self._chunk_file.tell() - offset
+            self._chunk_file.truncate(offset)
+            self._chunk_file.seek(offset)
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+from collections.abc import Awaitable
+from pathlib import Path
+
+import cv2
+import numpy as np
+import rosys
+from nicegui import background_tasks, run
+
+from .information import CameraInformation
+from .recording import INFORMATION_FILE, chunk_path, read_index
+from .stereo_depth import StereoDepthEngine
+from .zedxmini import Frame, ZedxminiBase
+
+
+class ZedxminiReplay(ZedxminiBase):
+    """Serves a recording made with `Recorder` through the regular camera API.
+
+    Chunks are memory-mapped, so raw channels are handed out without copying.
+    Frames are paced by their original arrival times divided by `speed`; `speed=float('inf')` replays at full speed.
+    When looping, timestamps keep increasing so that readers waiting for newer frames are not confused.
+    With `stereo_depth` the depth view and XYZ measure are matched from the recorded pair on the CPU
+    (at 1/`stereo_downscale` resolution) instead of read from the recording, which then only needs both views.
+    """
+
+    def __init__(self, path: Path | str, history_size: int = 5, *, speed: float = 1.0, loop: bool = True,
+                 stereo_depth: bool = False, stereo_downscale: int = 2) -> None:
+        assert speed > 0
+        super().__init__('ZedxminiReplay', history_size)
+        self.path = Path(path)
+        self.speed = speed
+        self.loop = loop
+        information = json.loads((self.path / INFORMATION_FILE).read_text())
+        # NOTE: recordings started before the camera was open have no information
+        if information:
+            self.camera_information = CameraInformation.from_dict(information)
+        self.fps = float(information.get('fps', self.fps)) * speed
+        self.index: list[dict] = []
+        self.chunks: list[np.memmap] = []
+        self.is_playing = False
+        self.stereo_engine: StereoDepthEngine | None = None
+        if stereo_depth:
+            self.stereo_engine = StereoDepthEngine(information['calibration'], tuple(information['resolution']),
+                                                   downscale=stereo_downscale)
+            rosys.on_shutdown(self.stereo_engine.close)
+        rosys.on_startup(self.setup_camera)
+
+    async def setup_camera(self):
+        if not self._open():
+            return
+        background_tasks.create(self._play(), name=f'{self.name} play')
+        self.set_ready()
+
+    def _open(self) -> bool:
+        """Read the index and map the chunks; False if the recording contains no frames."""
+        self.index = read_index(self.path)
+        if not self.index:
+            self.log.warning('recording %s contains no frames', self.path)
+            return False
+        chunk_count = max(entry['chunk'] for frame in self.index for entry in frame['channels'].values()) + 1
+        self.chunks = [np.memmap(chunk_path(self.path, chunk), dtype=np.uint8, mode='r')
+                       for chunk in range(chunk_count)]
+        return True
+
+    async def _play(self) -> None:
+        timestamps = [frame['timestamp'] for frame in self.index]
+        period = (timestamps[-1] - timestamps[0]) / (len(timestamps) - 1) if len(timestamps) > 1 else 1.0
+        offset = 0.0
+        self.is_playing = True
+        while self.is_playing:
+            start = time.monotonic()
+            first_received = self.index[0]['received']
+            for entry in self.index:
+                delay = (entry['received'] - first_received) / self.speed - (time.monotonic() - start)
+                await asyncio.sleep(max(delay, 0.0))
+                if not self.is_playing:
+                    return
+                with self.metrics.measure('replay'):
+                    frame = await self._load(entry, entry['timestamp'] + offset)
+                self._update_statistics(frame)
+                self.add_frame(frame)
+            if not self.loop:
+                break
+            offset += timestamps[-1] - timestamps[0] + period
+        self.is_playing = False
+
+    async def _load(self, entry: dict, timestamp: float) -> Frame:
+        channels = self.subscriptions.active
+        stereo = self.stereo_engine is not None and bool(channels & {'depth', 'xyz'})
+        if stereo:
+            channels = (channels - {'depth', 'xyz', 'confidence'}) | {'left', 'right'}
+        arrays: dict[str, np.ndarray] = {}
+        decodings: dict[str, Awaitable[np.ndarray]] = {}
+        for channel, location in entry['channels'].items():
+            if channel not in channels:
+                continue
+            data = self.chunks[location['chunk']][location['offset']:location['offset'] + location['nbytes']]
+            if location['encoding'] == 'raw':
+                arrays[channel] = data.view(location['dtype']).reshape(location['shape'])
+            else:
+                buffer = self.frame_history.claim(channel, tuple(location['shape']), np.dtype(location['dtype']))
+                decodings[channel] = run.io_bound(self._decode, data, buffer)
+        arrays.update(zip(decodings, await asyncio.gather(*decodings.values())))
+        if stereo and 'left' in arrays and 'right' in arrays:
+            assert self.stereo_engine is not None
+            shape = (*arrays['left'].shape[:2], 4)
+            xyz = self.frame_history.claim('xyz', shape, np.float32)
+            depth = self.frame_history.claim('depth', shape)
+            with self.metrics.measure('stereo_depth'):
+                arrays['xyz'], arrays['depth'] = await run.io_bound(self.stereo_engine.compute, arrays['left'],
+                                                                    arrays['right'], xyz=xyz, depth=depth)
+        return Frame(camera_id=self.name, timestamp=timestamp, left=arrays.get('left'), right=arrays.get('right'),
+                     depth=arrays.get('depth'), point_cloud=arrays.get('xyz'), confidence=arrays.get('confidence'))
+
+    @staticmethod
+    def _decode(jpeg: np.ndarray, buffer: np.ndarray) -> np.ndarray:
+        image = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+        cv2.cvtColor(image, cv2.COLOR_BGR2BGRA, dst=buffer)
+        return buffer
+
+    def _update_statistics(self, frame: Frame) -> None:
+        if self.last_frame is not None:
+            interval = frame.received - self.last_frame.received
+            if interval > 0:
+                self.capture_statistics.fps = 0.9 * self.capture_statistics.fps + 0.1 / interval
+        self.capture_statistics.frames += 1
+
+    def stop(self) -> None:
+        self.is_playing = False
+
+    def get_camera_setting(self, setting_type) -> tuple[bool, int]:
+        return (False, -1)
+
+    def set_camera_setting(self, setting_type, value) -> bool:
+        return False
@@ -0,0 +1,343 @@
+"""HTTP and WebSocket routes serving one camera; mount them with a prefix per camera."""
+import base64
+import io
+import json
+import math
+import struct
+import time
+from collections.abc import AsyncIterator
+from email.utils import formatdate
+
+import cv2
+import numpy as np
+import rosys
+from fastapi import APIRouter, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from nicegui import run
+from pydantic import BaseModel
+
+from .frame_history import FrameExpiredError
+from .governor import QualityGovernor
+from .points import MIN_VOXEL_SIZE
+from .zedxmini import JPEG_QUALITY, VIEWS, Frame, ZedxminiBase
+
+black_1px = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAAAXNSR0IArs4c6QAAAA1JREFUGFdjYGBg+A8AAQQBAHAgZQsAAAAASUVORK5CYII='
+placeholder = Response(content=base64.b64decode(black_1px.encode('ascii')), media_type='image/png')
+# NOTE: keeps the GZip middleware from compressing already compressed or bulky payloads on the event loop
+UNCOMPRESSED = {'Content-Encoding': 'identity'}
+# how long requests with `after` wait for a newer frame before answering 304 Not Modified
+LONG_POLL_TIMEOUT = 10.0
+
+
+def frame_etag(frame: Frame) -> str:
+    return f'"{frame.camera_id}-{frame.timestamp!r}"'
+
+
+def cache_headers(frame: Frame, timestamp: float | None) -> dict[str, str]:
+    """Validators keyed on the frame; responses addressing a frame by its exact timestamp never change."""
+    return {
+        'ETag': frame_etag(frame),
+        'Last-Modified': formatdate(time.time() - frame.age, usegmt=True),
+        'Cache-Control': 'public, max-age=3600, immutable' if timestamp == frame.timestamp else 'no-cache',
+    }
+
+
+def is_not_modified(request: Request, frame: Frame) -> bool:
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is None:
+        return False
+    etags = {etag.strip().removeprefix('W/') for etag in if_none_match.split(',')}
+    return '*' in etags or frame_etag(frame) in etags
+
+
+def parse_box(text: str) -> tuple[int, int, int, int] | None:
+    try:
+        x0, y0, x1, y1 = (int(v) for v in text.split(','))
+    except ValueError:
+        return None
+    return x0, y0, x1, y1
+
+
+def image_headers(frame: Frame, view: str, shrink: int) -> dict[str, str]:
+    return {
+        'X-Camera-Id': frame.camera_id,
+        'X-Image-Width': str(max(frame.size.width // shrink, 1)),
+        'X-Image-Height': str(max(frame.size.height // shrink, 1)),
+        'X-Image-Time': repr(frame.timestamp),
+        'X-Image-View': view,
+        'X-Image-Tags': '',
+    }
+
+
+class GovernorUpdate(BaseModel):
+    enabled: bool | None = None
+    level: int | None = None
+    target_latency: float | None = None
+
+
+class PointsQuery(BaseModel):
+    pixels: list[tuple[int, int]] = []
+    boxes: list[tuple[int, int, int, int]] = []
+    time: float | None = None
+
+
+def array_headers(frame: Frame, array: np.ndarray) -> dict[str, str]:
+    return {
+        'X-Camera-Id': frame.camera_id,
+        'X-Image-Time': repr(frame.timestamp),
+        'X-Array-Shape': ','.join(str(n) for n in array.shape),
+        'X-Array-Dtype': array.dtype.str,
+        **UNCOMPRESSED,
+    }
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    _, data = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    return data.tobytes()
+
+
+def encode_npy(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def create_router(camera: ZedxminiBase, governor: QualityGovernor | None = None) -> APIRouter:
+    router = APIRouter()
+
+    async def request_frame(channel: str, time: float | None, after: float | None) -> Frame | None:
+        if after is not None:
+            return await camera.request_frame(channel, after=after, timeout=LONG_POLL_TIMEOUT)
+        return await camera.request_frame(channel, time)
+
+    @router.get('/images/{image_name}')
+    async def grab_frame(request: Request, image_name: str, shrink: int = 1, quality: int = JPEG_QUALITY,
+                         time: float | None = None, after: float | None = None, crop: str | None = None) -> Response:
+        """JPEG of a view, optionally cropped to `crop=x0,y0,x1,y1` (full-resolution pixels) before shrinking."""
+        if image_name not in VIEWS:
+            return placeholder
+        box = parse_box(crop) if crop is not None else None
+        if crop is not None and box is None:
+            return Response(status_code=400)
+        frame = await request_frame(image_name, time, after)
+        if frame is None:
+            return Response(status_code=304) if after is not None else placeholder
+        if is_not_modified(request, frame):
+            return Response(status_code=304, headers=cache_headers(frame, time))
+        data = await camera.get_jpeg(image_name, shrink=max(shrink, 1), quality=quality, crop=box, frame=frame)
+        if data is None:
+            return placeholder
+        return Response(content=data, media_type='image/jpeg', headers={**cache_headers(frame, time), **UNCOMPRESSED})
+
+    @router.get('/image')
+    async def grab_image(request: Request, time: float | None = None, after: float | None = None) -> Response:
+        frame = await request_frame('left', time, after)
+        if frame is None and after is not None:
+            return Response(status_code=304)
+        if frame is None or frame.left is None:
+            return JSONResponse('')
+        if is_not_modified(request, frame):
+            return Response(status_code=304, headers=cache_headers(frame, time))
+        shrink, _ = camera.jpeg_parameters()  # NOTE: the governor may shrink the image
+        data = await camera.get_jpeg('left', shrink=shrink, frame=frame)
+        if data is None:
+            return JSONResponse('')
+        encoded_image = data.hex()
+        return JSONResponse({
+            'camera_id': frame.camera_id,
+            'width': max(frame.size.width // shrink, 1),
+            'height': max(frame.size.height // shrink, 1),
+            'time': frame.timestamp,
+            'is_broken': False,
+            'tags': [],
+            'image': encoded_image,
+        }, headers=cache_headers(frame, time))
+
+    @router.get('/image/jpeg')
+    async def grab_image_jpeg(request: Request, view: str = 'left', shrink: int = 1, quality: int = JPEG_QUALITY,
+                              time: float | None = None, after: float | None = None) -> Response:
+        if view not in VIEWS:
+            return Response(status_code=404)
+        frame = await request_frame(view, time, after)
+        if frame is None:
+            return Response(status_code=304 if after is not None else 404)
+        shrink, quality = camera.jpeg_parameters(max(shrink, 1), quality)
+        if is_not_modified(request, frame):
+            return Response(status_code=304,
+                            headers={**cache_headers(frame, time), **image_headers(frame, view, shrink)})
+        data = await camera.get_jpeg(view, shrink=shrink, quality=quality, frame=frame)
+        if data is None:
+            return Response(status_code=404)
+        return Response(content=data, media_type='image/jpeg',
+                        headers={**cache_headers(frame, time), **image_headers(frame, view, shrink), **UNCOMPRESSED})
+
+    async def stream_jpegs(view: str, shrink: int, quality: int) -> AsyncIterator[tuple[Frame, int, bytes]]:
+        """Yield each new frame as JPEG along with the shrink factor used; frames arriving while busy are skipped."""
+        unsubscribe = camera.subscriptions.subscribe(view)
+        try:
+            frame = camera.last_frame
+            while True:
+                if frame is not None:
+                    used_shrink, _ = camera.jpeg_parameters(shrink, quality)
+                    data = await camera.get_jpeg(view, shrink=shrink, quality=quality, frame=frame)
+                    if data is not None:
+                        yield frame, used_shrink, data
+                frame = await camera.wait_for_frame(frame.timestamp if frame is not None else None, timeout=5.0)
+        finally:
+            unsubscribe()
+
+    @router.get('/image/stream')
+    async def stream_image(view: str = 'left', shrink: int = 1, quality: int = JPEG_QUALITY) -> Response:
+        if view not in VIEWS:
+            return Response(status_code=404)
+
+        async def parts() -> AsyncIterator[bytes]:
+            async for frame, used_shrink, data in stream_jpegs(view, max(shrink, 1), quality):
+                headers = {'Content-Type': 'image/jpeg', 'Content-Length': str(len(data)),
+                           **image_headers(frame, view, used_shrink)}
+                head = ''.join(f'{k}: {v}\r\n' for k, v in headers.items()).encode()
+                yield b'--frame\r\n' + head + b'\r\n' + data + b'\r\n'
+        return StreamingResponse(parts(), media_type='multipart/x-mixed-replace; boundary=frame', headers=UNCOMPRESSED)
+
+    @router.websocket('/image/ws')
+    async def push_image(websocket: WebSocket, view: str = 'left', shrink: int = 1,
+                         quality: int = JPEG_QUALITY) -> None:
+        """Push frames as binary messages: 4 byte big-endian header length, JSON header, JPEG data."""
+        if view not in VIEWS:
+            await websocket.close(code=1008)
+            return
+        await websocket.accept()
+        try:
+            async for frame, used_shrink, data in stream_jpegs(view, max(shrink, 1), quality):
+                header = json.dumps({
+                    'camera_id': frame.camera_id,
+                    'width': max(frame.size.width // used_shrink, 1),
+                    'height': max(frame.size.height // used_shrink, 1),
+                    'time': frame.timestamp,
+                    'view': view,
+                    'tags': [],
+                }).encode()
+                await websocket.send_bytes(struct.pack('!I', len(header)) + header + data)
+        except WebSocketDisconnect:
+            pass
+
+    @router.get('/point')
+    async def get_point(request: Request, x: int = 0, y: int = 0, time: float | None = None,
+                        after: float | None = None) -> Response:
+        frame = await request_frame('xyz', time, after)
+        if frame is None and after is not None:
+            return Response(status_code=304)
+        if frame is None or frame.point_cloud is None:
+            return JSONResponse({'x': None, 'y': None, 'z': None})
+        if is_not_modified(request, frame):
+            return Response(status_code=304, headers=cache_headers(frame, time))
+        try:
+            point3d: rosys.geometry.Point3d | None = camera.get_point(int(x), int(y), frame=frame)
+        except FrameExpiredError:
+            return Response(status_code=410)
+        valid = math.isfinite(point3d.x) and math.isfinite(point3d.y) and math.isfinite(point3d.z)
+        return JSONResponse({
+            'x': point3d.x if valid else None,
+            'y': point3d.y if valid else None,
+            'z': point3d.z if valid else None,
+        }, headers=cache_headers(frame, time))
+
+    @router.post('/points')
+    async def get_points(query: PointsQuery) -> JSONResponse:
+        frame = await camera.request_frame('xyz', query.time)
+        if frame is None or frame.point_cloud is None:
+            return JSONResponse({'points': [], 'boxes': []})
+        try:
+            points = camera.get_points(query.pixels, frame=frame).tolist() if query.pixels else []
+            boxes = camera.get_box_statistics(query.boxes, frame=frame)
+        except FrameExpiredError:
+            return JSONResponse({'detail': 'frame expired'}, status_code=410)
+        return JSONResponse({
+            'points': [point if all(math.isfinite(v) for v in point) else None for point in points],
+            'boxes': [statistics.to_dict() for statistics in boxes],
+        })
+
+    @router.get('/depth/raw')
+    async def get_depth_raw(format: str = 'png', stride: int = 1, time: float | None = None) -> Response:
+        """Metric depth in uint16 millimeters (0 = invalid) as 16 bit PNG or raw row-major binary (`format=bin`)."""
+        if format not in ('png', 'bin'):
+            return Response(status_code=400)
+        frame = await camera.request_frame('xyz', time)
+        if frame is None or frame.point_cloud is None:
+            return Response(status_code=404)
+        try:
+            depth = await run.io_bound(camera.get_depth, stride=max(stride, 1), frame=frame)
+        except FrameExpiredError:
+            return Response(status_code=410)
+        if format == 'png':
+            return Response(content=await run.io_bound(encode_png, depth), media_type='image/png',
+                            headers=array_headers(frame, depth))
+        return Response(content=depth.tobytes(), media_type='application/octet-stream',
+                        headers=array_headers(frame, depth))
+
+    @router.get('/pointcloud')
+    async def get_pointcloud(format: str = 'npy', dtype: str = 'float32', stride: int = 1, voxel: float = 0.0,
+                             time: float | None = None) -> Response:
+        """XYZ in meters as NPY or raw row-major binary (`format=bin`).
+
+        The cloud is organized (height, width, 3) with NaN for invalid pixels unless `voxel` (meters) is given,
+        which reduces it to one (N, 3) centroid per voxel; voxels smaller than a millimeter are rejected.
+        """
+        if format not in ('npy', 'bin') or dtype not in ('float32', 'float16'):
+            return Response(status_code=400)
+        if 0 < voxel < MIN_VOXEL_SIZE:
+            return Response(status_code=400)
+        frame = await camera.request_frame('xyz', time)
+        if frame is None or frame.point_cloud is None:
+            return Response(status_code=404)
+        try:
+            points = await run.io_bound(camera.get_point_cloud, stride=max(stride, 1), voxel_size=max(voxel, 0.0),
+                                        dtype=dtype, frame=frame)
+        except FrameExpiredError:
+            return Response(status_code=410)
+        if format == 'npy':
+            return Response(content=await run.io_bound(encode_npy, points), media_type='application/octet-stream',
+                            headers=array_headers(frame, points))
+        return Response(content=points.tobytes(), media_type='application/octet-stream',
+                        headers=array_headers(frame, points))
+
+    @router.get('/obstacles')
+    async def get_obstacles(time: float | None = None) -> JSONResponse:
+        """Ground plane and obstacle height grid (meters above the ground per cell, null where unobserved)."""
+        analysis = await camera.analyze_point_cloud(time)
+        if analysis is None:
+            return JSONResponse({'time': None, 'ground': None, 'grid': None})
+        return JSONResponse({
+            'time': analysis.timestamp,
+            'ground': None if analysis.ground is None else analysis.ground.to_dict(),
+            'grid': None if analysis.grid is None else analysis.grid.to_dict(),
+        })
+
+    @router.get('/information')
+    async def get_information() -> Response:
+        """Identity and calibration, possibly of the previous run while the camera is still being opened."""
+        if camera.camera_information is None:
+            return JSONResponse({'detail': 'camera information not available yet'}, status_code=503)
+        return Response(camera.camera_information.encoded, media_type='application/json')
+
+    @router.get('/ready')
+    async def get_ready() -> JSONResponse:
+        return JSONResponse({'ready': camera.is_ready}, status_code=200 if camera.is_ready else 503)
+
+    if governor is not None:
+        @router.get('/governor')
+        async def get_governor() -> JSONResponse:
+            return JSONResponse(governor.to_dict())
+
+        @router.put('/governor')
+        async def update_governor(update: GovernorUpdate) -> JSONResponse:
+            """Switch automatic stepping on or off, change the latency target or set a level by hand."""
+            if update.enabled is not None:
+                governor.enabled = update.enabled
+            if update.target_latency is not None:
+                governor.target_latency = update.target_latency
+            if update.level is not None and not await governor.set_level(update.level):
+                return JSONResponse(governor.to_dict(), status_code=409)
+            return JSONResponse(governor.to_dict())
+
+    return router
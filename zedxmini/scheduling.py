@@ -0,0 +1,61 @@
+import asyncio
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+
+class FairScheduler:
+    """Hands out `capacity` numbered tokens; when owners compete, freed tokens go to them in turn.
+
+    Several cameras sharing one worker pool thereby get equal shares,
+    no matter how many requests each of them has queued.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        assert capacity > 0
+        self.capacity = capacity
+        self._free = list(reversed(range(capacity)))
+        self._waiters: OrderedDict[str, deque[asyncio.Future[int]]] = OrderedDict()
+
+    @property
+    def busy(self) -> int:
+        return self.capacity - len(self._free)
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    @asynccontextmanager
+    async def use(self, owner: str = '') -> AsyncIterator[int]:
+        token = await self.acquire(owner)
+        try:
+            yield token
+        finally:
+            self.release(token)
+
+    async def acquire(self, owner: str = '') -> int:
+        if self._free and not self._waiters:
+            return self._free.pop()
+        future: asyncio.Future[int] = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(owner, deque()).append(future)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(future.result())
+            elif owner in self._waiters and future in self._waiters[owner]:
+                self._waiters[owner].remove(future)
+                if not self._waiters[owner]:
+                    del self._waiters[owner]
+            raise
+
+    def release(self, token: int) -> None:
+        while self._waiters:
+            owner, waiters = self._waiters.popitem(last=False)
+            future = waiters.popleft()
+            if waiters:
+                self._waiters[owner] = waiters  # back of the line
+            if not future.done():
+                future.set_result(token)
+                return
+        self._free.append(token)
@@ -1,43 +1,77 @@
-import logging
+import time
+from collections.abc import Callable
 
 import rosys
-from nicegui import events, ui
+from nicegui import context, events, ui
 
-try:
-    from pyzed import sl
-except ModuleNotFoundError:
-    logging.warning("ModuleNotFoundError: No module named 'pyzed'")
-    sl = None
+from .frame_history import FrameExpiredError
+from .governor import QualityGovernor
+from .zedxmini import Frame, Zedxmini, ZedxminiBase, import_sdk
 
-from .zedxmini import Zedxmini, ZedxminiSimulation
+# give up waiting for the browser to report a loaded image after this many seconds
+LOAD_TIMEOUT = 2.0
+# edge length of the full-resolution region shown around a clicked point
+ZOOM_SIZE = 256
 
 
 class StereoCard(ui.card):
-    def __init__(self, zedxmini: Zedxmini | ZedxminiSimulation, shrink_factor: int = 2, update_interval: float = 1.0 / 30.0, show_crosshair: bool = True) -> None:
+    def __init__(self, zedxmini: ZedxminiBase, shrink_factor: int = 2, update_interval: float = 0.0, show_crosshair: bool = True, governor: QualityGovernor | None = None) -> None:
         super().__init__()
         self.style('position: relative;')
         self.zedxmini = zedxmini
+        self.governor = governor
         self.shrink_factor = shrink_factor
         self.show_crosshair = show_crosshair
+        # optional lower bound for the time between two updates of a view; the browser's load rate paces them anyway
+        self.update_interval = update_interval
+        self._unsubscribe: dict[str, Callable[[], None]] = {}
+        # when the browser of this client was asked to load a view which it has not reported as loaded yet
+        self._loading_since: dict[str, float] = {}
+        self._last_update: dict[str, float] = {}
+        # shrink factor of the image currently shown in each view, to map clicks back to full resolution
+        self._shown_shrink: dict[str, int] = {}
+        self.zoom_view = 'left'
+        self.zoom_center: tuple[int, int] | None = None
 
         with self:
             self.label = ui.label('test')
             with ui.expansion('Einstellungen').classes('w-full text-align:right'):
-                left_image_view_switch = ui.switch('Left Camera', value=True)
-                right_image_view_switch = ui.switch('Right Camera', value=False)
-                depth_image_view_switch = ui.switch('Depth Image', value=True)
+                left_image_view_switch = ui.switch('Left Camera', value=True,
+                                                   on_change=lambda e: self._subscribe('left', e.value))
+                right_image_view_switch = ui.switch('Right Camera', value=False,
+                                                    on_change=lambda e: self._subscribe('right', e.value))
+                depth_image_view_switch = ui.switch('Depth Image', value=True,
+                                                    on_change=lambda e: self._subscribe('depth', e.value))
                 ui.switch('Show Crosshair').bind_value(self, 'show_crosshair')
                 ui.number(label='Shrink', value=shrink_factor, format='%1d').bind_value_to(self, 'shrink_factor')
 
-            if sl is not None:
-                with ui.expansion('Camera Control').classes('w-full text-align:right'):
-                    with ui.row():
-                        ui.label('SATURATION')
-                        ui.slider(min=0, max=8, value=self.zedxmini.get_camera_setting(sl.VIDEO_SETTINGS.SATURATION)[0], on_change=lambda e: self.zedxmini.set_camera_setting(
-                            sl.VIDEO_SETTINGS.SATURATION, int(e.value)))
+            # NOTE: filled once the camera is open, since the SDK is imported in the background before that
+            self.camera_control = ui.element('div').classes('w-full')
+            if isinstance(zedxmini, Zedxmini):
+                if zedxmini.is_ready:
+                    self._build_camera_control()
+                zedxmini.READY.register_ui(self._build_camera_control)
+
+            if governor is not None:
+                with ui.expansion('Quality').classes('w-full text-align:right'):
+                    ui.switch('Adaptive').bind_value(governor, 'enabled')
+                    # NOTE: only the user's "change" on release sets the level, not values set by `_update_quality`
+                    self.level_slider = ui.slider(min=0, max=len(governor.levels) - 1, value=governor.level) \
+                        .on('change', self._set_level, [None])
+                    self.quality_label = ui.label().classes('whitespace-pre font-mono text-xs')
+                self._update_quality()
+                governor.LEVEL_CHANGED.register_ui(lambda _: self._update_quality())
 
             with ui.expansion('Information').classes('w-full text-align:right'):
-                ui.label('TODO: zedxmini.get_camera_information()')
+                self.information_label = ui.label().classes('whitespace-pre font-mono text-xs')
+            self._update_information()
+            zedxmini.READY.register_ui(self._update_information)
+
+            with ui.expansion('Metrics').classes('w-full text-align:right') as metrics_expansion:
+                self.metrics_label = ui.label().classes('whitespace-pre font-mono text-xs')
+            ui.timer(1.0, lambda: self._update_metrics() if metrics_expansion.value else None)
+            if governor is not None:
+                ui.timer(1.0, self._update_quality)
 
             with ui.row():
                 with ui.card().tight().bind_visibility_from(left_image_view_switch, 'value'):
@@ -51,22 +85,156 @@ class StereoCard(ui.card):
                     ui.label('Depth Image')
                     self.depth_image_view = ui.interactive_image(
                         '', on_mouse=self.left_mouse_handler, events=['mousedown'], cross=True)
-        ui.timer(update_interval, self._new_frame)
+                with ui.card().tight().bind_visibility_from(self, 'zoom_center', backward=lambda c: c is not None):
+                    with ui.row().classes('w-full items-center justify-between pl-2'):
+                        ui.label('Zoom')
+                        ui.button(icon='close', on_click=self._close_zoom).props('flat dense')
+                    self.zoom_image_view = ui.interactive_image(
+                        '', on_mouse=self.left_mouse_handler, events=['mousedown'], cross=True)
+        self.switches = {'left': left_image_view_switch, 'right': right_image_view_switch,
+                         'depth': depth_image_view_switch}
+        self.image_views = {'left': self.left_image_view, 'right': self.right_image_view,
+                            'depth': self.depth_image_view}
+        for view, image_view in (*self.image_views.items(), ('zoom', self.zoom_image_view)):
+            image_view.on('loaded', lambda _, view=view: self._loading_since.pop(view, None))
+        for view, switch in self.switches.items():
+            self._subscribe(view, switch.value)
+        self.zedxmini.NEW_FRAME.register_ui(self._new_frame)
+        if not context.client.shared:
+            context.client.on_disconnect(self._unsubscribe_all)
 
-    def left_mouse_handler(self, e: events.MouseEventArguments) -> None:
-        point3d = self.zedxmini.get_point(e.image_x, e.image_y)
-        rosys.notify(f'Clicked point: {point3d.tuple}')
+    def _build_camera_control(self) -> None:
+        sl = import_sdk()  # NOTE: cached, the camera has imported the SDK before it became ready
+        self.camera_control.clear()
+        if sl is None:
+            return
+        with self.camera_control, ui.expansion('Camera Control').classes('w-full text-align:right'):
+            with ui.row():
+                ui.label('SATURATION')
+                ui.slider(min=0, max=8, value=self.zedxmini.get_camera_setting(sl.VIDEO_SETTINGS.SATURATION)[0], on_change=lambda e: self.zedxmini.set_camera_setting(
+                    sl.VIDEO_SETTINGS.SATURATION, int(e.value)))
+
+    def _update_metrics(self) -> None:
+        self.metrics_label.text = '\n'.join(self.zedxmini.metrics.summary())
+
+    async def _set_level(self, e: events.GenericEventArguments) -> None:
+        assert self.governor is not None
+        await self.governor.set_level(int(e.args))  # NOTE: ignored while a previous change is still reopening
+        self._update_quality()
+
+    def _update_quality(self) -> None:
+        assert self.governor is not None
+        level = self.governor.current
+        sample = self.governor.sample
+        if not self.governor.is_changing:
+            self.level_slider.value = self.governor.level
+        self.quality_label.text = '\n'.join([
+            f'level {self.governor.level}: JPEG quality <= {level.jpeg_quality}, shrink >= {level.shrink}',
+            f'depth mode {level.depth_mode}, {level.fps:.0f} fps',
+            f'encode p{100 * self.governor.quantile:.0f}: {1000 * sample.encode_latency:.0f} ms '
+            f'(target {1000 * self.governor.target_latency:.0f} ms)',
+            f'fps ratio {sample.fps_ratio:.2f}, CPU {sample.cpu_percent:.0f} %',
+        ])
+
+    def _update_information(self) -> None:
+        information = self.zedxmini.camera_information
+        state = 'ready' if self.zedxmini.is_ready else 'opening...'
+        if information is None:
+            self.information_label.text = state
+            return
+        calibration = information.calibration
+        self.information_label.text = '\n'.join([
+            f'{information.camera_model} #{information.serial_number} ({state})',
+            f'{information.resolution[0]}x{information.resolution[1]} @ {information.fps:.0f} fps',
+            f'firmware {information.camera_firmware}, sensors {information.sensors_firmware}',
+            f'baseline {calibration.baseline:.1f} mm, '
+            f'fx {calibration.left_cam.fx:.1f}, fy {calibration.left_cam.fy:.1f}',
+        ])
+
+    def _subscribe(self, view: str, active: bool) -> None:
+        if active and view not in self._unsubscribe:
+            self._unsubscribe[view] = self.zedxmini.subscriptions.subscribe(view)
+        elif not active and view in self._unsubscribe:
+            self._unsubscribe.pop(view)()
+
+    def _unsubscribe_all(self) -> None:
+        for unsubscribe in self._unsubscribe.values():
+            unsubscribe()
+        self._unsubscribe.clear()
 
-    def _new_frame(self) -> None:
-        if self.zedxmini is None:
+    async def left_mouse_handler(self, e: events.MouseEventArguments) -> None:
+        if e.sender is self.zoom_image_view:
+            if self._zoom_box is None:
+                return
+            x0, y0, _, _ = self._zoom_box
+            shrink = self._shown_shrink.get('zoom', 1)
+            x, y = x0 + int(e.image_x * shrink), y0 + int(e.image_y * shrink)
+        else:
+            view = next(view for view, image_view in self.image_views.items() if image_view is e.sender)
+            shrink = self._shown_shrink.get(view, int(self.shrink_factor))
+            x, y = int(e.image_x * shrink), int(e.image_y * shrink)
+            self.zoom_view = view
+        self.zoom_center = (x, y)
+        frame = await self.zedxmini.request_frame('xyz')
+        if frame is None or frame.point_cloud is None:
             return
-        if not self.zedxmini.has_frames:
+        try:
+            point3d = self.zedxmini.get_point(x, y, frame=frame)
+        except FrameExpiredError:
             return
+        rosys.notify(f'Clicked point: {point3d.tuple}')
+
+    def _close_zoom(self) -> None:
+        self.zoom_center = None
+
+    @property
+    def _zoom_box(self) -> tuple[int, int, int, int] | None:
+        """A ZOOM_SIZE square around the zoom center, shifted to lie within the last frame."""
         frame = self.zedxmini.last_frame
-        assert frame is not None
-        self.label.text = f'Image resolution: {frame.left.size.width} x {frame.left.size.height} || Image timestamp: {frame.timestamp}'
-        self.left_image_view.set_source(f'/images/left?{frame.timestamp}&shrink={int(self.shrink_factor)}')
+        if self.zoom_center is None or frame is None:
+            return None
+        size = frame.size
+        x0 = min(max(self.zoom_center[0] - ZOOM_SIZE // 2, 0), max(size.width - ZOOM_SIZE, 0))
+        y0 = min(max(self.zoom_center[1] - ZOOM_SIZE // 2, 0), max(size.height - ZOOM_SIZE, 0))
+        return x0, y0, x0 + ZOOM_SIZE, y0 + ZOOM_SIZE
+
+    def _show(self, key: str, image_view: ui.interactive_image, source: str, now: float) -> bool:
+        """Set the source unless the client is still loading the previous one or the update interval has not passed."""
+        if now - self._loading_since.get(key, float('-inf')) < LOAD_TIMEOUT:
+            return False
+        if now - self._last_update.get(key, float('-inf')) < self.update_interval:
+            return False
+        self._loading_since[key] = self._last_update[key] = now
+        image_view.set_source(source)
+        return True
+
+    def _new_frame(self, frame: Frame) -> None:
+        """Show the frame in all visible views whose previous image has been loaded by this client's browser.
+
+        Slow clients thereby skip frames at their own pace instead of queueing requests.
+        """
+        now = time.monotonic()
+        shrink = int(self.shrink_factor)
+        updated = False
+        for view, image_view in self.image_views.items():
+            if not self.switches[view].value or frame.get_view(view) is None:
+                continue
+            if self._show(view, image_view, f'/images/{view}?time={frame.timestamp}&shrink={shrink}', now):
+                self._shown_shrink[view] = self.zedxmini.jpeg_parameters(shrink)[0]
+                updated = True
+        zoom_box = self._zoom_box
+        if zoom_box is not None and frame.get_view(self.zoom_view) is not None:
+            crop = ','.join(str(v) for v in zoom_box)
+            if self._show('zoom', self.zoom_image_view,
+                          f'/images/{self.zoom_view}?time={frame.timestamp}&crop={crop}', now):
+                # NOTE: the governor may shrink the crop as well, but never below one pixel (see `get_jpeg`)
+                x0, y0, x1, y1 = zoom_box
+                width, height = min(x1, frame.size.width) - x0, min(y1, frame.size.height) - y0
+                self._shown_shrink['zoom'] = min(self.zedxmini.jpeg_parameters()[0], width, height)
+                updated = True
+        if not updated:
+            return
+        self.label.text = f'Image resolution: {frame.size.width} x {frame.size.height} || Image timestamp: {frame.timestamp}'
+        left_shrink = self._shown_shrink.get('left', shrink)
         self.left_image_view.set_content(
-            f'''<circle cx="{(frame.left.size.width/self.shrink_factor)/2}" cy="{(frame.left.size.height/self.shrink_factor)/2}" r="5" stroke="red" stroke-width="3" fill="None" />''' if self.show_crosshair else '')
-        self.right_image_view.set_source(f'/images/right?{frame.timestamp}&shrink={int(self.shrink_factor)}')
-        self.depth_image_view.set_source(f'/images/depth?{frame.timestamp}&shrink={int(self.shrink_factor)}')
+            f'''<circle cx="{(frame.size.width/left_shrink)/2}" cy="{(frame.size.height/left_shrink)/2}" r="5" stroke="red" stroke-width="3" fill="None" />''' if self.show_crosshair else '')
@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+class StereoDepthEngine:
+    """Metric depth from left/right pairs with OpenCV's semi-global block matcher, for backends without the ZED SDK.
+
+    Rectification maps are computed once from the calibration (baseline in millimeters, pinhole and distortion
+    of both cameras as in camera_information.json); views retrieved from the SDK are already rectified,
+    so remapping is skipped when the calibration has no distortion.
+    With `downscale` the pair is matched at a reduced resolution.
+    The rows are split into overlapping tiles which are matched in parallel worker threads (OpenCV releases the GIL).
+    The results have the full input resolution, like the SDK's measures.
+    """
+
+    def __init__(self, calibration: dict, resolution: tuple[int, int], *, downscale: int = 1,
+                 num_disparities: int = 64, block_size: int = 5, tiles: int | None = None, overlap: int = 16) -> None:
+        self.width, self.height = resolution
+        self.downscale = downscale
+        self.size = (self.width // downscale, self.height // downscale)
+        self.baseline = float(calibration['baseline'])
+        # disparities are searched at the matching resolution, in multiples of 16
+        self.num_disparities = max(16, int(np.ceil(num_disparities / downscale / 16)) * 16)
+        self.tiles = max(1, min(tiles or os.cpu_count() or 1, self.size[1] // (4 * overlap) or 1))
+        self.overlap = overlap
+        self.matchers = [cv2.StereoSGBM_create(
+            minDisparity=0, numDisparities=self.num_disparities, blockSize=block_size,
+            P1=8 * block_size ** 2, P2=32 * block_size ** 2, uniquenessRatio=10,
+            speckleWindowSize=100, speckleRange=2, mode=cv2.STEREO_SGBM_MODE_SGBM_3WAY,
+        ) for _ in range(self.tiles)]
+        self.pool = ThreadPoolExecutor(self.tiles, thread_name_prefix='stereo depth')
+
+        # pinhole matrices at the matching resolution and distortion coefficients
+        scale = np.diag([1 / downscale, 1 / downscale, 1.0])
+        cameras = [self._camera(calibration[key], scale) for key in ('left_cam', 'right_cam')]
+        self.maps: list[tuple[np.ndarray, np.ndarray]] | None = None
+        if any(distortion.any() for _, distortion in cameras):
+            rectification = cv2.stereoRectify(*cameras[0], *cameras[1], self.size,
+                                              np.eye(3), np.array([[-self.baseline], [0.0], [0.0]]), alpha=0)
+            rotations, projections = rectification[0:2], rectification[2:4]
+            self.maps = [cv2.initUndistortRectifyMap(*camera, rotation, projection, self.size, cv2.CV_16SC2)
+                         for camera, rotation, projection in zip(cameras, rotations, projections)]
+            matrix = projections[0][:, :3]
+        else:
+            matrix = cameras[0][0]
+        fx, fy, cx, cy = (downscale * value for value in (matrix[0, 0], matrix[1, 1], matrix[0, 2], matrix[1, 2]))
+        # NOTE: z = fx * baseline / disparity at the matching resolution, where both are divided by `downscale`
+        self.depth_factor = np.float32(fx / downscale * self.baseline)
+        self.rays_x = ((np.arange(self.width, dtype=np.float32) - cx) / fx)[None, :]
+        self.rays_y = ((np.arange(self.height, dtype=np.float32) - cy) / fy)[:, None]
+        self._disparity = np.empty(self.size[::-1], dtype=np.int16)
+
+    @staticmethod
+    def _camera(calibration: dict, scale: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        matrix = scale @ np.array([[calibration['fx'], 0.0, calibration['cx']],
+                                   [0.0, calibration['fy'], calibration['cy']],
+                                   [0.0, 0.0, 1.0]])
+        distortion = np.array([calibration.get(key, 0.0) for key in ('k1', 'k2', 'p1', 'p2', 'k3')])
+        return matrix, distortion
+
+    def _prepare(self, image: np.ndarray, index: int) -> np.ndarray:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY)
+        if self.downscale > 1:
+            gray = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+        if self.maps is not None:
+            gray = cv2.remap(gray, *self.maps[index], cv2.INTER_LINEAR)
+        return gray
+
+    def _match(self, index: int, left: np.ndarray, right: np.ndarray) -> None:
+        """Match one horizontal tile, extended by the overlap so that path costs at its borders are complete."""
+        rows = self.size[1]
+        y0, y1 = rows * index // self.tiles, rows * (index + 1) // self.tiles
+        top, bottom = max(y0 - self.overlap, 0), min(y1 + self.overlap, rows)
+        disparity = self.matchers[index].compute(left[top:bottom], right[top:bottom])
+        self._disparity[y0:y1] = disparity[y0 - top:y1 - top]
+
+    def compute(self, left: np.ndarray, right: np.ndarray, *,
+                xyz: np.ndarray | None = None, depth: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """XYZ(A) measure in millimeters (NaN where unmatched) and a BGRA depth view of a BGR(A) image pair.
+
+        Results are written into `xyz` and `depth` if given. Calls are not reentrant; run them one at a time.
+        """
+        assert left.shape[:2] == right.shape[:2] == (self.height, self.width), 'images do not match the calibration'
+        left_gray, right_gray = self._prepare(left, 0), self._prepare(right, 1)
+        list(self.pool.map(self._match, range(self.tiles), [left_gray] * self.tiles, [right_gray] * self.tiles))
+        disparity = self._disparity.astype(np.float32)
+        disparity[disparity <= 0] = np.nan
+        disparity *= 1 / 16  # NOTE: SGBM returns fixed point disparities with 4 fractional bits
+        if self.downscale > 1:
+            disparity = cv2.resize(disparity, (self.width, self.height), interpolation=cv2.INTER_NEAREST)
+
+        if xyz is None:
+            xyz = np.empty((self.height, self.width, 4), dtype=np.float32)
+        z = xyz[..., 2]
+        np.divide(self.depth_factor, disparity, out=z)
+        np.multiply(self.rays_x, z, out=xyz[..., 0])
+        np.multiply(self.rays_y, z, out=xyz[..., 1])
+        xyz[..., 3] = 0.0
+
+        if depth is None:
+            depth = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        # brightness proportional to disparity, i.e. near is bright, like the SDK's depth view
+        brightness = np.nan_to_num(disparity * (255.0 / self.num_disparities), nan=0.0)
+        depth[..., :3] = np.clip(brightness, 0, 255)[..., None]
+        depth[..., 3] = 255
+        return xyz, depth
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=False)
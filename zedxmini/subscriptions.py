@@ -0,0 +1,48 @@
+import time
+from collections import Counter
+from collections.abc import Callable
+
+CHANNELS = ('left', 'right', 'depth', 'xyz', 'confidence')
+
+
+class Subscriptions:
+    """Tracks which channels of the camera have consumers.
+
+    Long-lived consumers (UI switches, Python code) subscribe until they unsubscribe.
+    One-off consumers (HTTP requests) touch a channel, which keeps it active for `window` seconds.
+    The capture loop reads `active` from its own thread to decide what to retrieve.
+    """
+
+    def __init__(self, window: float = 2.0) -> None:
+        self.window = window
+        self._subscribers: Counter[str] = Counter()
+        self._last_requests: dict[str, float] = {}
+
+    def subscribe(self, channel: str) -> Callable[[], None]:
+        """Register interest in a channel; returns a function which cancels the subscription."""
+        self._validate(channel)
+        self._subscribers[channel] += 1
+        return lambda: self.unsubscribe(channel)
+
+    def unsubscribe(self, channel: str) -> None:
+        self._validate(channel)
+        if self._subscribers[channel] > 0:
+            self._subscribers[channel] -= 1
+
+    def touch(self, channel: str) -> None:
+        self._validate(channel)
+        self._last_requests[channel] = time.monotonic()
+
+    def is_active(self, channel: str) -> bool:
+        if self._subscribers[channel] > 0:
+            return True
+        return time.monotonic() - self._last_requests.get(channel, float('-inf')) < self.window
+
+    @property
+    def active(self) -> set[str]:
+        return {channel for channel in CHANNELS if self.is_active(channel)}
+
+    @staticmethod
+    def _validate(channel: str) -> None:
+        if channel not in CHANNELS:
+            raise ValueError(f'unknown channel "{channel}"')
@@ -0,0 +1,82 @@
+import numpy as np
+
+# camera height above the ground and scene layout in millimeters (camera frame: x right, y down, z forward)
+CAMERA_HEIGHT = 500.0
+WALL_DISTANCE = 4000.0
+WALL_TOP = -1500.0
+BOXES = [  # x0, x1, y0, y1, z, BGR color
+    (-900.0, -300.0, -200.0, CAMERA_HEIGHT, 1500.0, (60, 60, 200)),
+    (200.0, 700.0, 0.0, CAMERA_HEIGHT, 1000.0, (60, 180, 60)),
+    (-200.0, 400.0, -600.0, 100.0, 2500.0, (200, 120, 40)),
+]
+
+
+class SyntheticScene:
+    """Deterministic stereo scene rendered once for the given calibration and resolution.
+
+    Both views are ray-cast from their own camera center, so the right image, the depth map and the XYZ measure
+    are consistent with the baseline and intrinsics of the calibration.
+    """
+
+    def __init__(self, calibration: dict, resolution: tuple[int, int], width: int, height: int) -> None:
+        scale_x = width / resolution[0]
+        scale_y = height / resolution[1]
+        left_cam = calibration['left_cam']
+        self.fx = left_cam['fx'] * scale_x
+        self.fy = left_cam['fy'] * scale_y
+        self.cx = left_cam['cx'] * scale_x
+        self.cy = left_cam['cy'] * scale_y
+        self.baseline = calibration['baseline']
+        self.width = width
+        self.height = height
+
+        depth, self.left = self._render(0.0)
+        _, self.right = self._render(self.baseline)
+        u, v = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+        self.xyz = np.zeros((height, width, 4), dtype=np.float32)
+        self.xyz[..., 0] = (u - self.cx) * depth / self.fx
+        self.xyz[..., 1] = (v - self.cy) * depth / self.fy
+        self.xyz[..., 2] = depth
+        self.confidence = np.where(np.isfinite(depth), 100.0, np.nan).astype(np.float32)
+        self.depth = np.zeros((height, width, 4), dtype=np.uint8)
+        self.depth[..., :3] = np.nan_to_num(255.0 * (1.0 - depth / WALL_DISTANCE), nan=0.0)[..., None]
+        self.depth[..., 3] = 255
+
+    def _render(self, origin_x: float) -> tuple[np.ndarray, np.ndarray]:
+        """Ray-cast the scene from a camera at (origin_x, 0, 0); returns the z distance and a BGRA image."""
+        u, v = np.meshgrid(np.arange(self.width, dtype=np.float32), np.arange(self.height, dtype=np.float32))
+        dx = (u - self.cx) / self.fx
+        dy = (v - self.cy) / self.fy
+        depth = np.full((self.height, self.width), np.inf, dtype=np.float32)
+        color = np.zeros((self.height, self.width, 3), dtype=np.float32)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ground = np.where(dy > 0, CAMERA_HEIGHT / dy, np.inf)
+        hit = ground < WALL_DISTANCE
+        depth[hit] = ground[hit]
+        x = origin_x + dx[hit] * ground[hit]
+        checker = (np.floor(x / 250.0) + np.floor(ground[hit] / 250.0)) % 2
+        color[hit] = np.stack([90 + 60 * checker, 110 + 60 * checker, 120 + 60 * checker], axis=-1)
+
+        wall_y = dy * WALL_DISTANCE
+        hit = (depth == np.inf) & (wall_y >= WALL_TOP)
+        depth[hit] = WALL_DISTANCE
+        x = origin_x + dx * WALL_DISTANCE
+        stripes = (np.sin(x / 60.0) * np.cos(wall_y / 90.0))[hit]
+        color[hit] = (170 + 60 * stripes)[:, None]
+
+        for x0, x1, y0, y1, z, box_color in BOXES:
+            x = origin_x + dx * z
+            y = dy * z
+            hit = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1) & (z < depth)
+            depth[hit] = z
+            shade = 0.75 + 0.25 * np.sin((x + y)[hit] / 40.0)
+            color[hit] = np.asarray(box_color, dtype=np.float32) * shade[:, None]
+
+        sky = depth == np.inf
+        depth[sky] = np.nan
+        color[sky] = (235, 206, 135)
+        image = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        image[..., :3] = np.clip(color, 0, 255)
+        image[..., 3] = 255
+        return depth, image
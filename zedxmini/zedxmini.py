@@ -1,66 +1,376 @@
+import asyncio
+import functools
 import logging
+import threading
+import time
 from abc import ABC, abstractmethod
-from collections import deque
-from dataclasses import dataclass
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field, replace
+from pathlib import Path
 from typing import Any
 
 import cv2
 import numpy as np
 import rosys
-from nicegui import run
+from nicegui import background_tasks, run
 from rosys.geometry import Point3d
-from rosys.vision import Image, ImageSize
+from rosys.vision import ImageSize
+
+from .encoding import JPEG_QUALITY, SharedMemoryEncoder, convert
+from .frame_history import FrameExpiredError, FrameHistory
+from .information import CameraInformation
+from .metrics import Metrics
+from .point_cloud_processing import PointCloudAnalysis, PointCloudProcessor
+from .points import BoxStatistics, box_statistics, clip_box, depth_map, gather_points, point_cloud, voxel_downsample
+from .scheduling import FairScheduler
+from .stereo_depth import StereoDepthEngine
+from .subscriptions import CHANNELS, Subscriptions
+from .synthetic_scene import SyntheticScene
+
+# the ZED SDK takes seconds to load, so it is only imported by `import_sdk` when a camera is opened
+sl: Any = None
+
+
+@functools.cache
+def import_sdk() -> Any:
+    """The ZED SDK module, imported on first use; None if it is not installed."""
+    global sl  # pylint: disable=global-statement
+    try:
+        from pyzed import sl as sdk  # pylint: disable=import-outside-toplevel
+    except ModuleNotFoundError:
+        logging.warning("ModuleNotFoundError: No module named 'pyzed'")
+        return None
+    sl = sdk
+    return sl
+
+
+VIEWS = ('left', 'right', 'depth')
+# depth modes of the ZED SDK from the most to the least expensive
+DEPTH_MODES = ('NEURAL_PLUS', 'NEURAL', 'ULTRA', 'QUALITY', 'PERFORMANCE')
+CAMERA_INFORMATION_PATH = Path(__file__).parent.parent / 'camera_information.json'
+# seconds between attempts to open a camera which is not (yet) available
+OPEN_RETRY_INTERVAL = 5.0
 
-try:
-    from pyzed import sl
-except ModuleNotFoundError:
-    logging.warning("ModuleNotFoundError: No module named 'pyzed'")
-    sl = None
+
+@dataclass
+class CaptureStatistics:
+    frames: int = 0
+    # sensor frames missed between two grabs, inferred from timestamp gaps
+    dropped: int = 0
+    # frames captured before the event loop picked up the previous one
+    late: int = 0
+    # grabs returning an image timestamp that was already captured
+    duplicates: int = 0
+    errors: int = 0
+    fps: float = 0.0
 
 
 @dataclass
 class Frame:
+    camera_id: str
     timestamp: float
-    left: Image
-    right: Image
-    depth: Image
-    # TODO
-    point_cloud: Any
+    left: np.ndarray | None
+    right: np.ndarray | None
+    depth: np.ndarray | None
+    # XYZ(A) measure in millimeters
+    point_cloud: np.ndarray | None
+    confidence: np.ndarray | None = None
+    # monotonic time when the frame was handed to the history
+    received: float = field(default_factory=time.monotonic, repr=False)
+    # encoded views by (view, shrink, quality, crop), shared by all readers of this frame
+    jpegs: dict[tuple[str, int, int, tuple[int, int, int, int] | None], asyncio.Task] = \
+        field(default_factory=dict, repr=False)
+    # ground plane and obstacle grid, computed on first request
+    analysis: asyncio.Task | None = field(default=None, repr=False)
+    # history slot and its generation, assigned when the frame is appended to the history
+    slot: int = field(default=-1, repr=False)
+    generation: int = field(default=-1, repr=False)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.received
+
+    @property
+    def size(self) -> ImageSize:
+        for channel in CHANNELS:
+            array = self.get_channel(channel)
+            if array is not None:
+                return ImageSize(width=array.shape[1], height=array.shape[0])
+        return ImageSize(width=0, height=0)
+
+    def get_view(self, view: str) -> np.ndarray | None:
+        if view not in VIEWS:
+            raise ValueError(f'unknown view "{view}"')
+        return getattr(self, view)
+
+    def get_channel(self, channel: str) -> np.ndarray | None:
+        if channel not in CHANNELS:
+            raise ValueError(f'unknown channel "{channel}"')
+        return self.point_cloud if channel == 'xyz' else getattr(self, channel)
 
 
 class ZedxminiBase(ABC):
     name: str
 
-    def __init__(self, name: str) -> None:
+    def __init__(self, name: str, history_size: int = 5, *, encoder: SharedMemoryEncoder | None = None,
+                 point_cloud_scheduler: FairScheduler | None = None) -> None:
+        """Cameras on one host may share an encoder and a point cloud scheduler to divide the workers fairly."""
         self.name = name
         self.log = logging.getLogger(self.name)
-        self.captured_frames: deque[Frame] = deque(maxlen=1)
+        self.frame_history = FrameHistory(history_size)
+        self.metrics = Metrics(name)
+        self.capture_statistics = CaptureStatistics()
+        self.encoder = encoder or SharedMemoryEncoder(metrics=self.metrics)
+        self.subscriptions = Subscriptions()
+        self.point_cloud_processor = PointCloudProcessor()
+        self.point_cloud_scheduler = point_cloud_scheduler or FairScheduler(1)
+        self.fps: float = 30.0
+        self.depth_mode = 'QUALITY'
+        # limits applied to every JPEG request, lowered by the quality governor under load
+        self.max_jpeg_quality = 100
+        self.min_shrink = 1
+        # snapshot of identity and calibration, possibly from a previous run until the camera is open
+        self.camera_information: CameraInformation | None = None
+        # whether the camera is open and delivering frames
+        self.is_ready = False
+        # called with every stored frame, possibly from the capture thread; must not block
+        self.frame_sinks: list[Callable[[Frame], None]] = []
+        self._frame_arrived = asyncio.Event()
+        rosys.on_startup(self.encoder.warm_up)
+        rosys.on_shutdown(self.encoder.close)
+
+        self.NEW_FRAME = rosys.event.Event()
+        """a new frame is available for readers (argument: frame)"""
+
+        self.READY = rosys.event.Event()
+        """the camera has been opened and delivers frames"""
+
+        self.metrics.gauge('capture_fps', lambda: self.capture_statistics.fps)
+        self.metrics.counter('captured_frames', lambda: self.capture_statistics.frames)
+        self.metrics.counter('dropped_frames', lambda: self.capture_statistics.dropped)
+        self.metrics.counter('late_frames', lambda: self.capture_statistics.late)
+        self.metrics.counter('duplicate_frames', lambda: self.capture_statistics.duplicates)
+        self.metrics.counter('capture_errors', lambda: self.capture_statistics.errors)
+        self.metrics.gauge('history_frames', lambda: len(self.frame_history))
+        if encoder is None:  # NOTE: a shared encoder is exported once by its owner, e.g. the manager
+            self.metrics.gauge('encoder_busy_slots', lambda: self.encoder.busy_slots)
 
     @abstractmethod
     def setup_camera(self):
         pass
 
+    def set_ready(self) -> None:
+        self.is_ready = True
+        self.READY.emit()
+
     @property
     def has_frames(self) -> bool:
-        return len(self.captured_frames) > 0
+        return self.frame_history.last is not None
 
     @property
     def last_frame(self) -> Frame | None:
-        if not self.has_frames:
+        return self.frame_history.last
+
+    def get_frame(self, timestamp: float | None = None, *, exact: bool = False) -> Frame | None:
+        """Get the frame with the given timestamp (or the closest one unless `exact`); the last frame by default."""
+        if timestamp is None:
+            return self.last_frame
+        return self.frame_history.find(timestamp, exact=exact)
+
+    def add_frame(self, frame: Frame) -> None:
+        self.store_frame(frame)
+        self._notify_frame()
+
+    def store_frame(self, frame: Frame) -> None:
+        """Append the frame to the history and hand it to the frame sinks without waking up readers."""
+        self.frame_history.append(frame)
+        for sink in self.frame_sinks:
+            sink(frame)
+
+    def _notify_frame(self) -> None:
+        self._frame_arrived.set()
+        self._frame_arrived = asyncio.Event()
+        self.NEW_FRAME.emit(self.last_frame)
+
+    async def wait_for_frame(self, after: float | None = None, timeout: float = 1.0) -> Frame | None:
+        """Wait for a frame newer than the given timestamp (default: the current last frame).
+
+        Returns None if no such frame arrives within the timeout.
+        """
+        if after is None:
+            after = self.last_frame.timestamp if self.last_frame is not None else float('-inf')
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.last_frame is None or self.last_frame.timestamp <= after:
+            try:
+                await asyncio.wait_for(self._frame_arrived.wait(), deadline - loop.time())
+            except TimeoutError:
+                return None
+        return self.last_frame
+
+    async def request_frame(self, channel: str, timestamp: float | None = None, timeout: float = 1.0, *,
+                            after: float | None = None) -> Frame | None:
+        """Get the frame for the given timestamp (default: the last one) and mark the channel as requested.
+
+        Without a timestamp this waits for one of the next frames if the last one was captured without the channel.
+        With `after` it waits for a frame newer than that timestamp and returns None if none arrives within `timeout`.
+        """
+        self.subscriptions.touch(channel)
+        if after is not None:
+            frame = await self.wait_for_frame(after, timeout)
+        else:
+            frame = self.get_frame(timestamp)
+            if timestamp is not None:
+                return frame
+        for _ in range(3):  # the frame being captured right now may have started before the request
+            if frame is None or frame.get_channel(channel) is not None:
+                break
+            frame = await self.wait_for_frame(frame.timestamp, timeout)
+        return frame
+
+    convert = staticmethod(convert)
+
+    def jpeg_parameters(self, shrink: int = 1, quality: int = JPEG_QUALITY) -> tuple[int, int]:
+        """The shrink factor and quality actually used for a JPEG request, given the current limits.
+
+        The quality is clamped to 0-100, since OpenCV warns on every encoding with a quality outside that range.
+        """
+        return max(shrink, self.min_shrink), min(max(quality, 0), self.max_jpeg_quality, 100)
+
+    async def get_jpeg(self, view: str, *, shrink: int = 1, quality: int = JPEG_QUALITY,
+                       crop: Sequence[int] | None = None, frame: Frame | None = None) -> bytes | None:
+        """Encode a view of the given (or last) frame on first request and cache the result on the frame.
+
+        A `crop` box (x0, y0, x1, y1) in full-resolution pixels is cut from the raw buffer before shrinking.
+        """
+        frame = frame or await self.request_frame(view)
+        if frame is None or frame.get_view(view) is None:
+            return None
+        shrink, quality = self.jpeg_parameters(shrink, quality)
+        if crop is not None:
+            crop = clip_box(crop, frame.size.width, frame.size.height)
+            if crop[0] == crop[2] or crop[1] == crop[3]:
+                return None
+            # NOTE: a region smaller than the shrink factor would shrink to nothing
+            shrink = min(shrink, crop[2] - crop[0], crop[3] - crop[1])
+        key = (view, shrink, quality, crop)
+        if key in frame.jpegs:
+            self.metrics.increment('encode_cache_hits')
+        else:
+            self.metrics.increment('encode_cache_misses')
+            frame.jpegs[key] = background_tasks.create(self._encode(frame, view, shrink, quality, crop),
+                                                       name=f'encode {view} {frame.timestamp}')
+        # NOTE: shield the shared encoding from cancellation of a single request
+        jpeg = await asyncio.shield(frame.jpegs[key])
+        self.metrics.observe('frame_age', frame.age)
+        return jpeg
+
+    async def _encode(self, frame: Frame, view: str, shrink: int, quality: int,
+                      crop: tuple[int, int, int, int] | None) -> bytes | None:
+        """JPEG of the view; None if the frame expired before its pixels were copied to the encoder."""
+        image = frame.get_view(view)
+        assert image is not None
+        if crop is not None:
+            x0, y0, x1, y1 = crop
+            image = image[y0:y1, x0:x1]  # NOTE: the encoder copies only this region into shared memory
+        try:
+            with self.metrics.measure('encode'):
+                return await self.encoder.encode(image, quality=quality, shrink=shrink, owner=self.name,
+                                                 check=lambda: self.check_frame(frame))
+        except FrameExpiredError:
             return None
-        return self.captured_frames[-1]
-
-    @abstractmethod
-    async def get_image(self) -> None:
-        pass
 
-    @abstractmethod
-    def get_point(self, x: int, y: int) -> Point3d:
-        pass
+    def get_point(self, x: int, y: int, timestamp: float | None = None, *, frame: Frame | None = None) -> Point3d:
+        point = self.get_points([(x, y)], timestamp, frame=frame)[0]
+        return Point3d(x=float(point[0]), y=float(point[1]), z=float(point[2]))
+
+    def get_points(self, pixels: np.ndarray | Sequence[Sequence[int]], timestamp: float | None = None, *,
+                   frame: Frame | None = None) -> np.ndarray:
+        """Look up the 3D coordinates in meters of many (x, y) pixels (N x 3, NaN where invalid)."""
+        frame = self._point_cloud_frame(timestamp, frame)
+        with self.metrics.measure('get_points'):
+            points = gather_points(frame.point_cloud, pixels)
+        self.check_frame(frame)
+        self.metrics.observe('frame_age', frame.age)
+        return points
+
+    def get_box_statistics(self, boxes: Sequence[Sequence[int]], timestamp: float | None = None, *,
+                           frame: Frame | None = None) -> list[BoxStatistics]:
+        """Median depth, valid pixel ratio and centroid of each (x0, y0, x1, y1) box."""
+        frame = self._point_cloud_frame(timestamp, frame)
+        statistics = [box_statistics(frame.point_cloud, box) for box in boxes]
+        self.check_frame(frame)
+        return statistics
+
+    def get_depth(self, timestamp: float | None = None, *, stride: int = 1, frame: Frame | None = None) -> np.ndarray:
+        """Metric depth as uint16 millimeters (0 where invalid), taken from the XYZ measure."""
+        xyz = self._copy_point_cloud(timestamp, frame, stride)
+        with self.metrics.measure('get_depth'):
+            return depth_map(xyz)
+
+    def get_point_cloud(self, timestamp: float | None = None, *, stride: int = 1, voxel_size: float = 0.0,
+                        dtype: np.dtype | type = np.float32, frame: Frame | None = None) -> np.ndarray:
+        """Point cloud in meters, organized (height, width, 3) with NaN for invalid pixels.
+
+        With a `voxel_size` (meters) the valid points are reduced to one centroid per voxel in an (N, 3) array.
+        """
+        xyz = self._copy_point_cloud(timestamp, frame, stride)
+        with self.metrics.measure('get_point_cloud'):
+            points = point_cloud(xyz)
+            if voxel_size > 0:
+                points = voxel_downsample(points, voxel_size)
+            return points.astype(dtype, copy=False)
+
+    def _point_cloud_frame(self, timestamp: float | None, frame: Frame | None) -> Frame:
+        self.subscriptions.touch('xyz')
+        frame = frame or self.get_frame(timestamp)
+        assert frame is not None
+        assert frame.point_cloud is not None
+        return frame
+
+    def _copy_point_cloud(self, timestamp: float | None, frame: Frame | None, stride: int) -> np.ndarray:
+        """Copy every `stride`th pixel of the XYZ measure first, so the frame's slot is only needed briefly."""
+        frame = self._point_cloud_frame(timestamp, frame)
+        with self.metrics.measure('copy_point_cloud'):
+            xyz = frame.point_cloud[::stride, ::stride].copy()
+        self.check_frame(frame)
+        return xyz
+
+    def check_frame(self, frame: Frame) -> None:
+        """Raise `FrameExpiredError` if the buffers of the frame have been reused; call it after reading them."""
+        if frame not in self.frame_history:
+            self.metrics.increment('expired_frame_reads')
+            raise FrameExpiredError(f'frame {frame.timestamp} of {self.name} expired while reading it')
+
+    async def analyze_point_cloud(self, timestamp: float | None = None) -> PointCloudAnalysis | None:
+        """Voxel cloud, ground plane and obstacle height grid of the given (or last) frame, computed once per frame."""
+        frame = await self.request_frame('xyz', timestamp)
+        if frame is None or frame.point_cloud is None:
+            return None
+        if frame.analysis is None:
+            frame.analysis = background_tasks.create(self._analyze(frame), name=f'analyze {frame.timestamp}')
+        return await asyncio.shield(frame.analysis)
+
+    async def _analyze(self, frame: Frame) -> PointCloudAnalysis | None:
+        """Analyze a copy of the sampled point cloud; None if the frame expired while waiting for a worker."""
+        assert frame.point_cloud is not None
+        stride = self.point_cloud_processor.stride
+        with self.metrics.measure('analyze_point_cloud'):
+            async with self.point_cloud_scheduler.use(self.name):
+                xyz = await run.io_bound(np.copy, frame.point_cloud[::stride, ::stride, :3])
+                try:
+                    self.check_frame(frame)
+                except FrameExpiredError:
+                    return None
+                # NOTE: the copy is sampled already
+                return await run.io_bound(self.point_cloud_processor.process, xyz, frame.timestamp, stride=1)
+
+    async def reconfigure(self, *, fps: float | None = None, depth_mode: str | None = None) -> bool:
+        """Change frame rate and depth mode; returns False if the camera does not support it."""
+        return False
 
-    @abstractmethod
     def get_camera_information(self) -> dict:
-        pass
+        return {} if self.camera_information is None else self.camera_information.to_dict()
 
     @abstractmethod
     def get_camera_setting(self, setting_type) -> tuple[bool, int]:
@@ -72,146 +382,203 @@ class ZedxminiBase(ABC):
 
 
 class Zedxmini(ZedxminiBase):
-    def __init__(self) -> None:
-        super().__init__('Zedxmini')
+    def __init__(self, history_size: int = 5, *, serial_number: int | None = None, fps: int = 30,
+                 depth_mode: str = 'QUALITY', information_path: Path | None = None,
+                 encoder: SharedMemoryEncoder | None = None,
+                 point_cloud_scheduler: FairScheduler | None = None) -> None:
+        """Open the camera with the given serial number or, without one, the first camera found.
+
+        The camera is opened in the background, retrying until it is available;
+        `is_ready` tells when it delivers frames.
+        Its information is stored at `information_path` whenever it changes and served from there until it is open.
+        """
+        # NOTE: the capture thread writes the oldest slot while readers use the newest ones
+        assert history_size >= 3, 'the capture thread needs at least triple buffering'
+        name = 'Zedxmini' if serial_number is None else f'Zedxmini {serial_number}'
+        super().__init__(name, history_size, encoder=encoder, point_cloud_scheduler=point_cloud_scheduler)
+        self.serial_number = serial_number
+        if information_path is None:
+            information_path = CAMERA_INFORMATION_PATH if serial_number is None else \
+                CAMERA_INFORMATION_PATH.with_name(f'camera_information_{serial_number}.json')
+        self.information_path = information_path
+        if information_path.exists():
+            self.camera_information = CameraInformation.load(information_path)
 
         self.log.setLevel(logging.DEBUG)
-        self.cam: sl.Camera = None
+        self.cam: Any = None
+        self.fps = fps
+        self.depth_mode = depth_mode
+        self._reconfigure_lock = asyncio.Lock()
+        # one matrix per channel and history slot; the SDK reuses their memory on every retrieve
+        self._mats: dict[str, list[Any]] = {}
+        self._capture_thread: threading.Thread | None = None
+        self._capturing = False
+        self._handoff_pending = False
+        self._handoff_started = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.metrics.gauge('handoff_pending', lambda: self._handoff_pending)
 
         rosys.on_startup(self.setup_camera)
         rosys.on_shutdown(self.__del__)
-        rosys.on_repeat(self.get_image, 1.0/30.0)
 
-    def setup_camera(self):
+    async def setup_camera(self) -> None:
+        if await run.io_bound(import_sdk) is None:
+            return
+        await self._open_until_ready(self._open)
+
+    async def _open_until_ready(self, open_camera: Callable[[], bool]) -> None:
+        """Retry opening the camera every OPEN_RETRY_INTERVAL seconds, then start capturing."""
+        while not await run.io_bound(open_camera):
+            self.log.warning('could not open the camera, retrying in %s s', OPEN_RETRY_INTERVAL)
+            await asyncio.sleep(OPEN_RETRY_INTERVAL)
+        self.start_capture()
+        self.set_ready()
+
+    def _open(self) -> bool:
         self.cam = sl.Camera()
         init = sl.InitParameters()
         init.camera_resolution = sl.RESOLUTION.HD1080
-        init.camera_fps = 30
-        init.depth_mode = sl.DEPTH_MODE.QUALITY
-        # init.depth_mode = sl.DEPTH_MODE.NEURAL_PLUS
+        init.camera_fps = int(self.fps)
+        if self.serial_number is not None:
+            init.set_from_serial_number(self.serial_number)
+        init.depth_mode = getattr(sl.DEPTH_MODE, self.depth_mode)
         status = self.cam.open(init)
         self.log.info("Camera Open: %s", status)
-
-    @staticmethod
-    def convert(rgba_image: np.ndarray, color=cv2.COLOR_BGRA2BGR) -> bytes:
-        rgb_image = cv2.cvtColor(rgba_image, color)
-        _, jpeg_image = cv2.imencode('.jpg', rgb_image)
-        jpeg_image_bytes = jpeg_image.tobytes()
-        return jpeg_image_bytes
-
-    async def get_image(self) -> None:
-        if self.cam is None:
-            return
-        err = await run.io_bound(self.cam.grab)
-        if err != sl.ERROR_CODE.SUCCESS:
-            self.log.error(err)
+        if status != sl.ERROR_CODE.SUCCESS:
+            self.cam.close()  # NOTE: every retry creates a new camera, the failed one must not linger
+            self.cam = None
+            return False
+        information = CameraInformation.from_sdk(self.cam.get_camera_information())
+        if information != self.camera_information:
+            information.save(self.information_path)
+        self.camera_information = information
+        return True
+
+    def _reopen(self) -> bool:
+        if not self.stop_capture(timeout=5.0):
+            return False  # NOTE: closing the camera while the capture thread still grabs would crash the SDK
+        if self.cam is not None:
+            self.cam.close()
+        return self._open()
+
+    async def reconfigure(self, *, fps: float | None = None, depth_mode: str | None = None) -> bool:
+        """Reopen the camera with a new frame rate and depth mode, falling back to the previous ones on failure.
+
+        Readers keep getting the frames in the history while the camera is reopened.
+        Returns False without changing anything while the camera has not been opened yet.
+        If it cannot be reopened with the previous settings either, it is retried in the background like on startup.
+        """
+        if depth_mode is not None and depth_mode not in DEPTH_MODES:
+            raise ValueError(f'unknown depth mode "{depth_mode}"')
+        async with self._reconfigure_lock:
+            if not self.is_ready:
+                return False
+            previous = (self.fps, self.depth_mode)
+            self.fps = fps or self.fps
+            self.depth_mode = depth_mode or self.depth_mode
+            if (self.fps, self.depth_mode) == previous:
+                return True
+            target = (self.fps, self.depth_mode)
+            self.log.info('reopening with %s fps and depth mode %s', *target)
+            self.is_ready = False
+            success = False
+            try:
+                with self.metrics.measure('reopen'):
+                    success = await run.io_bound(self._reopen)
+            finally:
+                if not success:
+                    self.fps, self.depth_mode = previous
+            if not success:
+                self.log.error('could not reopen with %s fps and depth mode %s', *target)
+                if not await run.io_bound(self._reopen):
+                    # NOTE: `_reopen` also waits for a capture thread which did not stop in time
+                    background_tasks.create(self._open_until_ready(self._reopen), name=f'{self.name} reopen')
+                    return False
+            self.start_capture()
+            self.set_ready()
+            return success
+
+    def start_capture(self) -> None:
+        """Grab frames at sensor rate in a dedicated thread, independent of the event loop."""
+        if self._capture_thread is not None:
             return
-
-        timestamp = self.cam.get_timestamp(sl.TIME_REFERENCE.IMAGE).get_milliseconds()
-
-        image = sl.Mat()
-        self.cam.retrieve_image(image, sl.VIEW.LEFT)
-        jpeg_image_bytes = await run.cpu_bound(self.convert, image.get_data())
-        left_image = Image(
-            camera_id=self.name,
-            size=ImageSize(width=image.get_width(), height=image.get_height()),
-            time=timestamp,
-            data=jpeg_image_bytes,
-        )
-
-        # image = sl.Mat()
-        # self.cam.retrieve_image(image, sl.VIEW.RIGHT)
-        # jpeg_image_bytes = await run.cpu_bound(self.convert, image.get_data())
-        # right_image = Image(
-        #     camera_id=self.name,
-        #     size=ImageSize(width=image.get_width(), height=image.get_height()),
-        #     time=timestamp,
-        #     data=jpeg_image_bytes,
-        # )
-        right_image = None
-
-        # image = sl.Mat()
-        # self.cam.retrieve_image(image, sl.VIEW.DEPTH)
-        # jpeg_image_bytes = await run.cpu_bound(self.convert, image.get_data())
-        # depth_image = Image(
-        #     camera_id=self.name,
-        #     size=ImageSize(width=image.get_width(), height=image.get_height()),
-        #     time=timestamp,
-        #     data=jpeg_image_bytes,
-        # )
-        depth_image = None
-
-        point_cloud = sl.Mat()
-        self.cam.retrieve_measure(point_cloud, sl.MEASURE.XYZ)
-
-        last_frame = Frame(timestamp=timestamp, left=left_image, right=right_image,
-                           depth=depth_image, point_cloud=point_cloud)
-        self.captured_frames.append(last_frame)
-
-    def get_point(self, x: int, y: int) -> Point3d:
-        # TODO: image id
-        assert self.has_frames
-        assert self.last_frame is not None
-        assert self.last_frame.point_cloud is not None
-        _, point = self.last_frame.point_cloud.get_value(int(x), int(y))
-        return Point3d(x=point[0] / 1000.0, y=point[1] / 1000.0, z=point[2] / 1000.0)
-
-    def get_camera_information(self) -> dict:
-        camera_information = self.cam.get_camera_information()
-        camera_dict = {
-            'camera_model': str(camera_information.camera_model),
-            'serial_number': camera_information.serial_number,
-            'camera_firmware': camera_information.camera_configuration.firmware_version,
-            'sensors_firmware': camera_information.sensors_configuration.firmware_version,
-            'resolution': (camera_information.camera_configuration.resolution.width, camera_information.camera_configuration.resolution.height),
-            'fps': camera_information.camera_configuration.fps,
-            'calibration': {
-                'baseline': camera_information.camera_configuration.calibration_parameters.get_camera_baseline(),
-                'left_cam': {
-                    'fx': camera_information.camera_configuration.calibration_parameters.left_cam.fx,
-                    'fy': camera_information.camera_configuration.calibration_parameters.left_cam.fy,
-                    'cx': camera_information.camera_configuration.calibration_parameters.left_cam.cx,
-                    'cy': camera_information.camera_configuration.calibration_parameters.left_cam.cy,
-                    'k1': camera_information.camera_configuration.calibration_parameters.left_cam.disto[0],
-                    'k2': camera_information.camera_configuration.calibration_parameters.left_cam.disto[1],
-                    'p1': camera_information.camera_configuration.calibration_parameters.left_cam.disto[2],
-                    'p2': camera_information.camera_configuration.calibration_parameters.left_cam.disto[3],
-                    'k3': camera_information.camera_configuration.calibration_parameters.left_cam.disto[4],
-                    'k4': camera_information.camera_configuration.calibration_parameters.left_cam.disto[5],
-                    'k5': camera_information.camera_configuration.calibration_parameters.left_cam.disto[6],
-                    'k6': camera_information.camera_configuration.calibration_parameters.left_cam.disto[7],
-                    's1': camera_information.camera_configuration.calibration_parameters.left_cam.disto[8],
-                    's2': camera_information.camera_configuration.calibration_parameters.left_cam.disto[9],
-                    's3': camera_information.camera_configuration.calibration_parameters.left_cam.disto[10],
-                    's4': camera_information.camera_configuration.calibration_parameters.left_cam.disto[11],
-                    'fov_vertical': camera_information.camera_configuration.calibration_parameters.left_cam.v_fov,
-                    'fov_horizontal': camera_information.camera_configuration.calibration_parameters.left_cam.h_fov,
-                    'fov_diagonal': camera_information.camera_configuration.calibration_parameters.left_cam.d_fov,
-                },
-                'right_cam': {
-                    'fx': camera_information.camera_configuration.calibration_parameters.right_cam.fx,
-                    'fy': camera_information.camera_configuration.calibration_parameters.right_cam.fy,
-                    'cx': camera_information.camera_configuration.calibration_parameters.right_cam.cx,
-                    'cy': camera_information.camera_configuration.calibration_parameters.right_cam.cy,
-                    'k1': camera_information.camera_configuration.calibration_parameters.right_cam.disto[0],
-                    'k2': camera_information.camera_configuration.calibration_parameters.right_cam.disto[1],
-                    'p1': camera_information.camera_configuration.calibration_parameters.right_cam.disto[2],
-                    'p2': camera_information.camera_configuration.calibration_parameters.right_cam.disto[3],
-                    'k3': camera_information.camera_configuration.calibration_parameters.right_cam.disto[4],
-                    'k4': camera_information.camera_configuration.calibration_parameters.right_cam.disto[5],
-                    'k5': camera_information.camera_configuration.calibration_parameters.right_cam.disto[6],
-                    'k6': camera_information.camera_configuration.calibration_parameters.right_cam.disto[7],
-                    's1': camera_information.camera_configuration.calibration_parameters.right_cam.disto[8],
-                    's2': camera_information.camera_configuration.calibration_parameters.right_cam.disto[9],
-                    's3': camera_information.camera_configuration.calibration_parameters.right_cam.disto[10],
-                    's4': camera_information.camera_configuration.calibration_parameters.right_cam.disto[11],
-                    'fov_vertical': camera_information.camera_configuration.calibration_parameters.right_cam.v_fov,
-                    'fov_horizontal': camera_information.camera_configuration.calibration_parameters.right_cam.h_fov,
-                    'fov_diagonal': camera_information.camera_configuration.calibration_parameters.right_cam.d_fov,
-                },
-            }
-        }
-        return camera_dict
+        self._loop = asyncio.get_running_loop()
+        self._capturing = True
+        self._capture_thread = threading.Thread(target=self._capture, name=f'{self.name} capture', daemon=True)
+        self._capture_thread.start()
+
+    def stop_capture(self, timeout: float = 1.0) -> bool:
+        """Stop the capture thread; returns False if it did not finish its current grab in time."""
+        self._capturing = False
+        if self._capture_thread is not None:
+            self._capture_thread.join(timeout=timeout)
+            if self._capture_thread.is_alive():
+                return False
+            self._capture_thread = None
+        return True
+
+    def _capture(self) -> None:
+        runtime_parameters = sl.RuntimeParameters()
+        period = 1000.0 / self.fps
+        last_timestamp: float | None = None
+        while self._capturing:
+            channels = self.subscriptions.active
+            runtime_parameters.enable_depth = bool(channels & {'depth', 'xyz', 'confidence'})
+            with self.metrics.measure('grab'):
+                err = self.cam.grab(runtime_parameters)
+            if err != sl.ERROR_CODE.SUCCESS:
+                self.log.error(err)
+                self.capture_statistics.errors += 1
+                time.sleep(period / 1000.0)
+                continue
+            timestamp = self.cam.get_timestamp(sl.TIME_REFERENCE.IMAGE).get_milliseconds()
+            if timestamp == last_timestamp:
+                self.capture_statistics.duplicates += 1
+                continue
+            if last_timestamp is not None:
+                interval = timestamp - last_timestamp
+                self.capture_statistics.dropped += max(round(interval / period) - 1, 0)
+                self.capture_statistics.fps = 0.9 * self.capture_statistics.fps + 0.1 * 1000.0 / interval
+            last_timestamp = timestamp
+            self.store_frame(self._retrieve(timestamp, channels))
+            self.capture_statistics.frames += 1
+            if self._handoff_pending:
+                self.capture_statistics.late += 1
+                continue
+            self._handoff_pending = True
+            self._handoff_started = time.perf_counter()
+            assert self._loop is not None
+            self._loop.call_soon_threadsafe(self._complete_handoff)
+
+    def _complete_handoff(self) -> None:
+        self.metrics.observe('handoff', time.perf_counter() - self._handoff_started)
+        self._handoff_pending = False
+        self._notify_frame()
+
+    def _retrieve(self, timestamp: float, channels: set[str]) -> Frame:
+        """Retrieve only the channels somebody asked for; raw pixels are kept and encoded lazily in get_jpeg."""
+        arrays: dict[str, np.ndarray | None] = dict.fromkeys(CHANNELS)
+        for channel, view in (('left', sl.VIEW.LEFT), ('right', sl.VIEW.RIGHT), ('depth', sl.VIEW.DEPTH)):
+            if channel in channels:
+                image = self._mat(channel)
+                with self.metrics.measure(f'retrieve_{channel}'):
+                    self.cam.retrieve_image(image, view)
+                arrays[channel] = image.get_data()
+        for channel, measure in (('xyz', sl.MEASURE.XYZ), ('confidence', sl.MEASURE.CONFIDENCE)):
+            if channel in channels:
+                matrix = self._mat(channel)
+                with self.metrics.measure(f'retrieve_{channel}'):
+                    self.cam.retrieve_measure(matrix, measure)
+                arrays[channel] = matrix.get_data()
+        return Frame(camera_id=self.name, timestamp=timestamp, left=arrays['left'], right=arrays['right'],
+                     depth=arrays['depth'], point_cloud=arrays['xyz'], confidence=arrays['confidence'])
+
+    def _mat(self, channel: str) -> Any:
+        """The matrix backing the given channel of the next frame in the history, evicting the frame it held."""
+        self.frame_history.evict()
+        if channel not in self._mats:
+            self._mats[channel] = [sl.Mat() for _ in range(self.frame_history.size)]
+        return self._mats[channel][self.frame_history.next_index]
 
     def get_camera_setting(self, setting_type) -> tuple[bool, int]:
         if self.cam is None:
@@ -226,81 +593,159 @@ class Zedxmini(ZedxminiBase):
         return False
 
     def __del__(self):
-        self.cam.close()
+        self.stop_capture()
+        if self.cam is not None:
+            self.cam.close()
+
+
+SIMULATED_CAMERA_INFORMATION = {
+    'camera_model': 'Zed Mini',
+    'serial_number': '1234567890',
+    'camera_firmware': '1.0.0',
+    'sensors_firmware': '1.0.0',
+    'resolution': (1280, 720),
+    'fps': 30,
+    'calibration': {
+        'baseline': 120,
+        'left_cam': {
+            'fx': 700,
+            'fy': 700,
+            'cx': 640,
+            'cy': 360,
+            'k1': 0.0,
+            'k2': 0.0,
+            'p1': 0.0,
+            'p2': 0.0,
+            'k3': 0.0,
+            'k4': 0.0,
+            'k5': 0.0,
+            'k6': 0.0,
+            's1': 0.0,
+            's2': 0.0,
+            's3': 0.0,
+            's4': 0.0,
+            'fov_vertical': 45.0,
+            'fov_horizontal': 90.0,
+            'fov_diagonal': 100.0,
+        },
+        'right_cam': {
+            'fx': 700,
+            'fy': 700,
+            'cx': 640,
+            'cy': 360,
+            'k1': 0.0,
+            'k2': 0.0,
+            'p1': 0.0,
+            'p2': 0.0,
+            'k3': 0.0,
+            'k4': 0.0,
+            'k5': 0.0,
+            'k6': 0.0,
+            's1': 0.0,
+            's2': 0.0,
+            's3': 0.0,
+            's4': 0.0,
+            'fov_vertical': 45.0,
+            'fov_horizontal': 90.0,
+            'fov_diagonal': 100.0,
+        },
+    }
+}
 
 
 class ZedxminiSimulation(ZedxminiBase):
-    def __init__(self) -> None:
-        super().__init__('ZedxminiSimulation')
-        rosys.on_repeat(self.get_image, 1.0)
-
-    def setup_camera(self):
-        pass
+    """Hardware-free camera serving a synthetic stereo scene at real resolution and frame rate.
+
+    With `stereo_depth` the depth view and XYZ measure are matched from the rendered pair on the CPU
+    (at 1/`stereo_downscale` resolution) instead of taken from the scene's ground truth.
+    """
+
+    def __init__(self, history_size: int = 5, *, width: int = 1920, height: int = 1080, fps: float = 30.0,
+                 camera_information_path: Path = CAMERA_INFORMATION_PATH, serial_number: int | None = None,
+                 encoder: SharedMemoryEncoder | None = None, point_cloud_scheduler: FairScheduler | None = None,
+                 stereo_depth: bool = False, stereo_downscale: int = 2) -> None:
+        name = 'ZedxminiSimulation' if serial_number is None else f'ZedxminiSimulation {serial_number}'
+        super().__init__(name, history_size, encoder=encoder, point_cloud_scheduler=point_cloud_scheduler)
+        self.serial_number = serial_number
+        self.width = width
+        self.height = height
+        self.fps = fps
+        # the calibration of a real camera (if available) scaled to the simulated resolution
+        if camera_information_path.exists():
+            information = CameraInformation.load(camera_information_path)
+        else:
+            information = CameraInformation.from_dict(SIMULATED_CAMERA_INFORMATION)
+        information = replace(information.scaled(width, height), fps=fps)
+        if serial_number is not None:
+            information = replace(information, serial_number=serial_number)
+        self.camera_information = information
+        self.scene: SyntheticScene | None = None
+        self.stereo_depth = stereo_depth
+        self.stereo_downscale = stereo_downscale
+        self.stereo_engine: StereoDepthEngine | None = None
+        self.frame_count = 0
+        rosys.on_startup(self.setup_camera)
+        self._repeater = rosys.on_repeat(self.get_image, 1.0 / fps)
+
+    async def setup_camera(self):
+        information = self.camera_information.to_dict()
+        self.scene = await run.io_bound(SyntheticScene, information['calibration'], information['resolution'],
+                                        self.width, self.height)
+        for array in (self.scene.right, self.scene.depth, self.scene.xyz, self.scene.confidence):
+            array.flags.writeable = False
+        if self.stereo_depth:
+            self.stereo_engine = StereoDepthEngine(information['calibration'], (self.width, self.height),
+                                                   downscale=self.stereo_downscale)
+            rosys.on_shutdown(self.stereo_engine.close)
+        self.set_ready()
 
     async def get_image(self) -> None:
+        if self.scene is None:
+            return
         timestamp = rosys.time()
-        left_image = Image.create_placeholder(f'{self.name}_left - {timestamp}', timestamp, self.name + "_left")
-        right_image = Image.create_placeholder(f'{self.name}_right - {timestamp}', timestamp, self.name + "_right")
-        depth_image = Image.create_placeholder(f'{self.name}_depth - {timestamp}', timestamp, self.name + "_depth")
+        if self.last_frame is not None:
+            interval = timestamp - self.last_frame.timestamp
+            self.capture_statistics.fps = 0.9 * self.capture_statistics.fps + 0.1 / interval
+        self.capture_statistics.frames += 1
+        self.frame_count += 1
+        channels = self.subscriptions.active
+        left_image: np.ndarray | None = None
+        if 'left' in channels:
+            # NOTE: only the left view changes between frames; all other channels are shared with the static scene
+            with self.metrics.measure('render'):
+                left_image = self.frame_history.claim('left', self.scene.left.shape)
+                np.copyto(left_image, self.scene.left)
+                cv2.putText(left_image, f'{self.name} #{self.frame_count}', (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0,
+                            (0, 0, 0, 255), 2)
+
+        depth, xyz, confidence = self.scene.depth, self.scene.xyz, self.scene.confidence
+        if self.stereo_engine is not None and channels & {'depth', 'xyz'}:
+            xyz_buffer = self.frame_history.claim('xyz', self.scene.xyz.shape, np.float32)
+            depth_buffer = self.frame_history.claim('depth', self.scene.depth.shape)
+            with self.metrics.measure('stereo_depth'):
+                xyz, depth = await run.io_bound(self.stereo_engine.compute, self.scene.left, self.scene.right,
+                                                xyz=xyz_buffer, depth=depth_buffer)
+            confidence = None
+
+        last_frame = Frame(camera_id=self.name, timestamp=timestamp, left=left_image,
+                           right=self.scene.right if 'right' in channels else None,
+                           depth=depth if 'depth' in channels else None,
+                           point_cloud=xyz if 'xyz' in channels else None,
+                           confidence=confidence if 'confidence' in channels else None)
+        self.add_frame(last_frame)
+
+    async def reconfigure(self, *, fps: float | None = None, depth_mode: str | None = None) -> bool:
+        """Change the frame rate; the depth mode is only recorded since the scene's depth is fixed."""
+        if depth_mode is not None and depth_mode not in DEPTH_MODES:
+            raise ValueError(f'unknown depth mode "{depth_mode}"')
+        self.fps = fps or self.fps
+        self.depth_mode = depth_mode or self.depth_mode
+        self._repeater.interval = 1.0 / self.fps
+        self.camera_information = replace(self.camera_information, fps=self.fps)
+        return True
 
-        last_frame = Frame(timestamp=timestamp, left=left_image, right=right_image,
-                           depth=depth_image, point_cloud=None)
-        self.captured_frames.append(last_frame)
-
-    def get_point(self, x: int, y: int) -> Point3d:
-        return Point3d(x=0.0, y=0.0, z=0.3)
+    def get_camera_setting(self, setting_type) -> tuple[bool, int]:
+        return (False, -1)
 
-    def get_camera_information(self) -> dict:
-        return {
-            'camera_model': 'Zed Mini',
-            'serial_number': '1234567890',
-            'camera_firmware': '1.0.0',
-            'sensors_firmware': '1.0.0',
-            'resolution': (1280, 720),
-            'fps': 30,
-            'calibration': {
-                'baseline': 120,
-                'left_cam': {
-                    'fx': 700,
-                    'fy': 700,
-                    'cx': 640,
-                    'cy': 360,
-                    'k1': 0.0,
-                    'k2': 0.0,
-                    'p1': 0.0,
-                    'p2': 0.0,
-                    'k3': 0.0,
-                    'k4': 0.0,
-                    'k5': 0.0,
-                    'k6': 0.0,
-                    's1': 0.0,
-                    's2': 0.0,
-                    's3': 0.0,
-                    's4': 0.0,
-                    'fov_vertical': 45.0,
-                    'fov_horizontal': 90.0,
-                    'fov_diagonal': 100.0,
-                },
-                'right_cam': {
-                    'fx': 700,
-                    'fy': 700,
-                    'cx': 640,
-                    'cy': 360,
-                    'k1': 0.0,
-                    'k2': 0.0,
-                    'p1': 0.0,
-                    'p2': 0.0,
-                    'k3': 0.0,
-                    'k4': 0.0,
-                    'k5': 0.0,
-                    'k6': 0.0,
-                    's1': 0.0,
-                    's2': 0.0,
-                    's3': 0.0,
-                    's4': 0.0,
-                    'fov_vertical': 45.0,
-                    'fov_horizontal': 90.0,
-                    'fov_diagonal': 100.0,
-                },
-            }
-        }
+    def set_camera_setting(self, setting_type, value) -> bool:
+        return False